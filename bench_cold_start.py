@@ -0,0 +1,80 @@
+"""
+Measures time from process start to the first useful reply, cold vs warm.
+
+    python bench_cold_start.py [--x11-latency 0.15] [--runs 3]
+
+Each run spawns a fresh bot process against stub_server.py and sends one
+"@taycan fsg tv" webhook as soon as it's listening. The clock stops when
+the schedule (not the "coming up" acknowledgement) reaches the GroupMe
+stub. "cold" starts with no warm-state file; "warm" boots from the file the
+previous process saved on SIGTERM.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+import loadtest
+import stub_server
+
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+CHILD = """
+import os, sys, time
+started = time.perf_counter()
+import main
+main.enable_warm_state()
+imported = time.perf_counter()
+from werkzeug.serving import make_server
+main.install_signal_handlers()
+server = make_server("127.0.0.1", 0, main.app, threaded=True)
+print(f"READY {server.server_port} {(imported - started) * 1000:.1f}", flush=True)
+server.serve_forever()
+"""
+
+def first_reply_ms(env):
+    before = len(stub_server.posted_messages)
+    started = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", CHILD], env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    ready = child.stdout.readline().split()
+    port, import_ms = int(ready[1]), float(ready[2])
+
+    requests.post(f"http://127.0.0.1:{port}/webhook", json={"text": "@taycan fsg tv", "sender_type": "user"}, timeout=60)
+    while not any("Kzhedule" in m.get("text", "") for m in stub_server.posted_messages[before:]):
+        time.sleep(0.005)
+    reply_ms = (time.perf_counter() - started) * 1000
+
+    child.terminate()  # SIGTERM -> atexit saves the warm state
+    child.wait(timeout=10)
+    return import_ms, reply_ms
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 3
+    stub_server.configure(x11=float(args[args.index("--x11-latency") + 1]) if "--x11-latency" in args else 0.15)
+    stub, stub_url = loadtest.serve(stub_server.app)
+
+    state_path = os.path.join(tempfile.mkdtemp(), "warm_state.json")
+    env = dict(os.environ, **stub_server.stub_env(stub_url))
+    env.update(WARM_STATE_PATH=state_path, LOG_LEVEL="WARNING")
+
+    results = {"cold": [], "warm": []}
+    for _ in range(runs):
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        results["cold"].append(first_reply_ms(env))
+        results["warm"].append(first_reply_ms(env))
+
+    print(f"{'mode':6} {'import main ms':>15} {'first reply ms':>15}")
+    for mode, samples in results.items():
+        imports = sorted(s[0] for s in samples)
+        replies = sorted(s[1] for s in samples)
+        print(f"{mode:6} {imports[len(imports) // 2]:15.1f} {replies[len(replies) // 2]:15.1f}")
+    if os.path.exists(state_path):
+        print(f"\nwarm-state file: {os.path.getsize(state_path)} bytes, keys: {sorted(json.load(open(state_path)))}")
+    stub.shutdown()
@@ -0,0 +1,82 @@
+"""
+Compares recap/preview prompts with and without token budgets.
+
+    python bench_prompts.py            # prompt sizes + build time only
+    python bench_prompts.py --live 3   # also time 3 real Gemini calls per variant (needs GEMINI_API_KEY)
+"""
+import sys
+import time
+
+import main
+
+def sample_recap_inputs():
+    match_data = {
+        "home_team": "Skull Mountain Boys", "away_team": "Sweatfield Wednesday",
+        "home_score": "3", "away_score": "2", "referee": "Pierluigi Bollocks",
+    }
+    kinds = [
+        "Free kick by Jan Berg, saved", "Shot by Tom Jones goes wide", "Corner for Skull Mountain Boys",
+        "Yellow card for Mark Ruud", "Goal by Jan Berg, assist Peter van Dijk", "Al Bo is injured",
+        "Mark Ruud subbed in for Al Bo", "Penalty to Sweatfield Wednesday", "Disallowed goal - Tom Jones offside",
+    ]
+    events = []
+    score = (0, 0)
+    for minute in range(1, 91, 2):
+        desc = kinds[minute % len(kinds)]
+        score_text = ""
+        if desc.startswith("Goal"):
+            score = (score[0] + 1, score[1])
+            score_text = f"{score[0]} - {score[1]}"
+        events.append(main.classify_match_event(str(minute), desc, score_text, score))
+    positions = ["GK", "DL", "DC", "DC", "DR", "ML", "MC", "MC", "MR", "FC", "FC"]
+    players = [
+        {"team": team, "position": pos, "name": f"Player {team[:3]}{i}", "grade": 4 + (i * 3) % 7}
+        for team in (match_data["home_team"], match_data["away_team"])
+        for i, pos in enumerate(positions + ["SUB"] * 5)
+    ]
+    return match_data, events, players
+
+def sample_preview_inputs():
+    match_data, _, players = sample_recap_inputs()
+    standings = [
+        {"team": match_data["home_team"], "place": 2, "wins": 8, "draws": 3, "losses": 2, "gf": 25, "ga": 14, "diff": 11, "points": 27},
+        {"team": match_data["away_team"], "place": 5, "wins": 6, "draws": 2, "losses": 5, "gf": 19, "ga": 18, "diff": 1, "points": 20},
+    ]
+    last = [
+        {"match_data": match_data, "player_grades": [p for p in players if p["team"] == s["team"]]}
+        for s in standings
+    ]
+    return standings[0], standings[1], last[0], last[1]
+
+def build(command, budget):
+    saved = dict(main.PROMPT_TOKEN_BUDGETS)
+    main.PROMPT_TOKEN_BUDGETS[command] = budget
+    try:
+        started = time.perf_counter()
+        if command == "recap":
+            prompt = main.format_gemini_prompt(*sample_recap_inputs())
+        else:
+            prompt = main.format_gemini_match_preview_prompt(*sample_preview_inputs())
+        return prompt, (time.perf_counter() - started) * 1000
+    finally:
+        main.PROMPT_TOKEN_BUDGETS.update(saved)
+
+def time_gemini(command, prompt, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        main.call_gemini_api(prompt, persona=command)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+if __name__ == "__main__":
+    live_runs = int(sys.argv[sys.argv.index("--live") + 1]) if "--live" in sys.argv else 0
+
+    for command in ("recap", "preview"):
+        for label, budget in (("before", None), ("after", main.PROMPT_TOKEN_BUDGETS[command])):
+            prompt, build_ms = build(command, budget)
+            line = f"{command:8} {label:7} ~{main.estimate_tokens(prompt):5} tokens  build {build_ms:6.2f} ms"
+            if live_runs:
+                line += f"  gemini p50 {time_gemini(command, prompt, live_runs):7.0f} ms"
+            print(line)
@@ -0,0 +1,150 @@
+"""
+Replays recorded GroupMe /webhook payloads against the bot and reports
+throughput, per-command latency percentiles and saturation.
+
+    python loadtest.py [--corpus loadtest_corpus.jsonl] [--rate 20] [--concurrency 16]
+                       [--requests 400] [--x11-latency 0.15] [--gemini-latency 1.5]
+                       [--groupme-latency 0.05] [--gemini-error-rate 0]
+
+X11, Gemini and GroupMe are replaced by stub_server.py (started in-process
+with the given latencies), and main.app is served by a threaded werkzeug
+server, so nothing leaves the machine. Corpus lines are
+{"kind": ..., "weight": ..., "payload": {...}} and are sampled by weight.
+The bot's admission budgets apply as configured (GEMINI_RPM per model, X11_RPM,
+SENDER_COMMANDS_PER_MINUTE, ...); raise them to measure raw capacity.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+import stub_server
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def load_corpus(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def serve(wsgi_app):
+    server = make_server("127.0.0.1", 0, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+class InFlightMiddleware:
+    """Counts requests currently inside the bot's WSGI app (worker occupancy)."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.in_flight += 1
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+def run(corpus, rate, concurrency, total, seed=1):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    # The stub has to be up before main is imported: main reads its URLs at import time
+    stub, stub_url = serve(stub_server.app)
+    os.environ.update(stub_server.stub_env(stub_url))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import main
+
+    in_flight = InFlightMiddleware(main.app.wsgi_app)
+    main.app.wsgi_app = in_flight
+    bot, bot_url = serve(main.app)
+
+    rng = random.Random(seed)
+    weights = [entry.get("weight", 1) for entry in corpus]
+    results = []  # (kind, latency_s, lag_s, ok)
+    results_lock = threading.Lock()
+    samples = []  # (in_flight, gemini_queue_depth)
+    stop_sampling = threading.Event()
+
+    def sample_saturation():
+        while not stop_sampling.wait(0.05):
+            samples.append((in_flight.in_flight, main.gemini_executor._work_queue.qsize()))
+
+    def fire(entry, scheduled_at, seq):
+        started = time.monotonic()
+        payload = dict(entry["payload"], id=f"load-{seq}", source_guid=f"load-{seq}")
+        try:
+            response = requests.post(f"{bot_url}/webhook", json=payload, timeout=120)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        with results_lock:
+            results.append((entry["kind"], time.monotonic() - started, started - scheduled_at, ok))
+
+    threading.Thread(target=sample_saturation, daemon=True).start()
+    began = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for seq in range(total):
+            scheduled_at = began + seq / rate
+            delay = scheduled_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            entry = rng.choices(corpus, weights=weights)[0]
+            pool.submit(fire, entry, scheduled_at, seq)
+    elapsed = time.monotonic() - began
+    stop_sampling.set()
+    bot.shutdown()
+    stub.shutdown()
+    return results, samples, elapsed, main.metrics
+
+def report(results, samples, elapsed, bot_metrics, rate, concurrency):
+    print(f"\n{len(results)} requests in {elapsed:.1f}s -> {len(results) / elapsed:.1f} req/s "
+          f"(offered {rate:.1f} req/s, {concurrency} client workers)\n")
+    print(f"{'command':14} {'n':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    kinds = sorted({r[0] for r in results})
+    for kind in kinds + ["ALL"]:
+        rows = [r for r in results if kind == "ALL" or r[0] == kind]
+        latencies = sorted(r[1] * 1000 for r in rows)
+        errors = sum(1 for r in rows if not r[3])
+        print(f"{kind:14} {len(rows):5} {errors:4} {percentile(latencies, 50):8.0f} {percentile(latencies, 95):8.0f} "
+              f"{percentile(latencies, 99):8.0f} {latencies[-1] if latencies else 0:8.0f}")
+
+    lags = sorted(r[2] * 1000 for r in results)
+    busy = [s[0] for s in samples] or [0]
+    gemini_queue = [s[1] for s in samples] or [0]
+    print(f"\nclient queueing lag: p50 {percentile(lags, 50):.0f} ms, p95 {percentile(lags, 95):.0f} ms "
+          f"(grows when the client pool of {concurrency} is saturated)")
+    print(f"bot requests in flight: avg {sum(busy) / len(busy):.1f}, max {max(busy)}")
+    print(f"gemini worker queue depth: avg {sum(gemini_queue) / len(gemini_queue):.1f}, max {max(gemini_queue)}")
+    for group, values in sorted(bot_metrics.items()):
+        print(f"bot {group}: " + ", ".join(f"{k}={round(v, 1)}" for k, v in sorted(values.items())))
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    def flag(name, default, cast=float):
+        return cast(args[args.index(name) + 1]) if name in args else default
+
+    rate = flag("--rate", 20.0)
+    concurrency = flag("--concurrency", 16, int)
+    stub_server.configure(
+        x11=flag("--x11-latency", 0.15),
+        gemini=flag("--gemini-latency", 1.5),
+        groupme=flag("--groupme-latency", 0.05),
+        error_rate=flag("--gemini-error-rate", 0.0),
+    )
+    corpus = load_corpus(flag("--corpus", "loadtest_corpus.jsonl", str))
+    results, samples, elapsed, bot_metrics = run(corpus, rate, concurrency, flag("--requests", 400, int))
+    report(results, samples, elapsed, bot_metrics, rate, concurrency)
@@ -3,10 +3,43 @@ import re
 import unicodedata
 import os
 import sys
-import requests
+import time
+import hashlib
+import threading
+import atexit
+import queue
+import random
+import uuid
+import logging
+import logging.handlers
+import contextvars
+import gzip
+import signal
+import importlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import json
-from bs4 import BeautifulSoup
-from flask import Flask, request
+import weakref
+from collections import deque
+from flask import Flask, request, jsonify, Response
+
+class LazyModule:
+    """Imports the named module on first attribute access, keeping it off the cold-start path."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# The scraping stack is only needed once a command actually runs
+requests = LazyModule("requests")
+
+def BeautifulSoup(markup, features):
+    from bs4 import BeautifulSoup as _BeautifulSoup
+    return _BeautifulSoup(markup, features)
 
 app = Flask(__name__)
 
@@ -15,15 +48,746 @@ GROUPME_BOT_ID = os.environ.get("GROUPME_BOT_ID")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 X11_USERNAME = os.environ.get("X11_USERNAME")
 X11_PASSWORD = os.environ.get("X11_PASSWORD")
-GOONDESLIGA_URL = os.environ.get("GOONDESLIGA_URL")
-SPOONDESLIGA_URL = os.environ.get("SPOONDESLIGA_URL")
+X11_BASE_URL = os.environ.get("X11_BASE_URL", "https://www.xperteleven.com")
+GROUPME_API_URL = os.environ.get("GROUPME_API_URL", "https://api.groupme.com/v3")
+
+# GroupMe groups this process answers in: group_id -> bot_id, e.g. "12345=abc,67890=def".
+# Replies go out through the bot of the group a command came from, else GROUPME_BOT_ID.
+GROUPME_BOTS = {
+    group.strip(): bot.strip()
+    for group, _, bot in (item.partition("=") for item in os.environ.get("GROUPME_BOTS", "").split(",") if "=" in item)
+}
+
+# League registry: every division or cup the bot covers, in display order. The first is
+# the top flight (default for leaders, home of the TV marquee matchup). A JSON list of
+# entries at LEAGUES_PATH replaces the defaults; only "key", "league_id" and "lnr" are
+# required. GOONDESLIGA_URL / SPOONDESLIGA_URL still override the default entries' pages.
+LEAGUES_PATH = os.environ.get("LEAGUES_PATH", "leagues.json")
+DEFAULT_LEAGUES = [
+    {
+        "key": "goondesliga", "name": "Goondesliga", "title": "The Goondesliga 🏆",
+        "url": os.environ.get("GOONDESLIGA_URL"), "league_id": 460905, "lnr": 1,
+        "relegation_label": "📉 Relegation watch", "aliases": ["goondesliga"],
+    },
+    {
+        "key": "spoondesliga", "name": "Spoondesliga", "title": "The Spoondesliga 🥄",
+        "url": os.environ.get("SPOONDESLIGA_URL"), "league_id": 460905, "lnr": 2,
+        "relegation_label": "🪨 Rock Bottom Watch", "aliases": ["spoondesliga", "spoon"],
+    },
+]
+
+def load_leagues(path=None):
+    """key -> league dict (key, name, title, url, league_id, lnr, relegation_label, aliases), in registry order."""
+    entries = DEFAULT_LEAGUES
+    path = LEAGUES_PATH if path is None else path
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            entries = json.load(f)
+    leagues = {}
+    for entry in entries:
+        league = {
+            "name": entry["key"].title(),
+            "relegation_label": "📉 Relegation watch",
+            "aliases": [entry["key"]],
+        }
+        league.update({field: value for field, value in entry.items() if value is not None})
+        league.setdefault("title", league["name"])
+        league.setdefault("url", f"{X11_BASE_URL}/league.aspx?Lid={league['league_id']}&Lnr={league['lnr']}&dh=2")
+        leagues[league["key"]] = league
+    return leagues
+
+LEAGUES = load_leagues()
 
 bot_aliases = ["@taycan a. schitt", "@taycan a schitt", "@taycan", "@taycan a", "@taycan a."]
 
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_FAST_MODEL = os.environ.get("GEMINI_FAST_MODEL", "gemini-2.0-flash-lite")
+
+# Model tiers per command, preferred first, e.g. "recap=gemini-2.0-flash-lite|gemini-2.0-flash".
+# Short highlights go to the fast tier; long previews to the main model.
+GEMINI_COMMAND_MODELS = {
+    "recap": [GEMINI_FAST_MODEL, GEMINI_MODEL],
+    "preview": [GEMINI_MODEL, GEMINI_FAST_MODEL],
+}
+GEMINI_COMMAND_MODELS.update({
+    command.strip(): [m.strip() for m in models.split("|") if m.strip()]
+    for command, _, models in (item.partition("=") for item in os.environ.get("GEMINI_COMMAND_MODELS", "").split(",") if "=" in item)
+})
+# Routing: a model is passed over while its smoothed latency x headroom exceeds the
+# time available, or while it has mostly been failing (for up to the recovery window)
+MODEL_EWMA_ALPHA = 0.2
+MODEL_LATENCY_HEADROOM = 1.5
+MODEL_UNHEALTHY_ERROR_RATE = 0.5
+MODEL_RECOVERY_SECONDS = 60
+# A failed tier only falls back to the next when at least this much of the deadline is left
+MODEL_FALLBACK_MIN_SECONDS = float(os.environ.get("MODEL_FALLBACK_MIN_SECONDS", 3))
+
+# Per-command deadline for a Gemini answer before the local template is posted instead
+GENERATION_DEADLINES = {
+    "recap": float(os.environ.get("GEMINI_RECAP_DEADLINE_SECONDS", 12)),
+    "preview": float(os.environ.get("GEMINI_PREVIEW_DEADLINE_SECONDS", 15)),
+}
+GEMINI_FAILURE = "[Failed to generate summary.]"
+
+PROFILES_PATH = "profiles.json"
+
+# Warm-state snapshot loaded at boot and saved periodically / on shutdown (empty path disables it)
+WARM_STATE_PATH = os.environ.get("WARM_STATE_PATH", "warm_state.json")
+WARM_STATE_SAVE_SECONDS = int(os.environ.get("WARM_STATE_SAVE_SECONDS", 300))
+WARM_STATE_VERSION = 1
+
+# How long a logged-in X11 session is reused before logging in again
+X11_SESSION_TTL_SECONDS = int(os.environ.get("X11_SESSION_TTL_SECONDS", 900))
+
+# Logging: LOG_LEVEL picks the level; LOG_SAMPLE_RATES keeps only a fraction of
+# chatty events, e.g. "gemini_response=0.05,standings_row=0.01"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATES = {
+    event.strip(): float(rate)
+    for event, _, rate in (item.partition("=") for item in os.environ.get("LOG_SAMPLE_RATES", "").split(",") if "=" in item)
+}
+
+# Request-scoped id stamped on every log line (GroupMe message id when there is one)
+correlation_id = contextvars.ContextVar("correlation_id", default="-")
+
+class CorrelationFilter(logging.Filter):
+    """Runs on the request thread, before the record is queued, so it sees the request's context."""
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "event": getattr(record, "event", record.funcName),
+            "cid": getattr(record, "correlation_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+log = logging.getLogger("fsgbot")
+
+def setup_logging():
+    """Queue-backed handler: the request thread only enqueues, a background listener writes to stderr."""
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationFilter())
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonLogFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    log.addHandler(queue_handler)
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+
+setup_logging()
+
+def log_event(level, event, message, **fields):
+    """Logs `message` as `event` with structured fields, honouring the level and LOG_SAMPLE_RATES."""
+    if not log.isEnabledFor(level):
+        return
+    rate = LOG_SAMPLE_RATES.get(event, 1.0)
+    if rate < 1.0 and random.random() >= rate:
+        return
+    log.log(level, message, extra={"event": event, "fields": fields})
+
+# In-process counters, exposed at /metrics
+metrics = {}
+metrics_lock = threading.Lock()
+
+def record_metric(group, name, value=1):
+    with metrics_lock:
+        bucket = metrics.setdefault(group, {})
+        bucket[name] = bucket.get(name, 0) + value
+
+# Latest scraped data, served read-only by the /api routes.
+# (kind, key) -> {"etag", "body", "gzip_body", "updated_at"}
+snapshots = {}
+snapshots_lock = threading.Lock()
+
+def store_snapshot(kind, key, data):
+    """
+    Serializes `data` once, with its strong ETag and gzip body, so /api polls
+    do no work beyond a dict lookup. Re-storing identical data keeps the old
+    ETag and updated_at.
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    etag = hashlib.sha256(payload).hexdigest()[:32]
+    with snapshots_lock:
+        current = snapshots.get((kind, key))
+        if current and current["etag"] == etag:
+            return
+    updated_at = time.time()
+    body = json.dumps({"updated_at": updated_at, "data": data}, ensure_ascii=False).encode("utf-8")
+    with snapshots_lock:
+        snapshots[(kind, key)] = {
+            "etag": etag,
+            "body": body,
+            "gzip_body": gzip.compress(body, compresslevel=6),
+            "updated_at": updated_at,
+        }
+
+def league_for_url(url):
+    return next((league for league in LEAGUES.values() if league["url"] == url), None)
+
+# League keys used in /api URLs and snapshot keys
+def league_key_for_url(url):
+    league = league_for_url(url)
+    return league["key"] if league else url
 
-with open("profiles.json", "r") as f:
+def find_league(text):
+    """The first registry league one of whose aliases appears in `text` as a word, or None."""
+    text = text.lower()
+    for league in LEAGUES.values():
+        if any(re.search(rf"\b{re.escape(alias.lower())}\b", text) for alias in league["aliases"]):
+            return league
+    return None
+
+def league_urls():
+    return [league["url"] for league in LEAGUES.values()]
+
+# Whole-command time budget, started when the webhook arrives
+WEBHOOK_DEADLINE_SECONDS = float(os.environ.get("WEBHOOK_DEADLINE_SECONDS", 45))
+
+# Per-stage socket timeout caps, also used when there's no deadline to share
+STAGE_TIMEOUTS = {
+    "x11_login": 10,
+    "x11_page": 10,
+    "gemini": 30,
+    "groupme": 5,
+}
+# Fraction of the remaining command budget a single call of each stage may use
+STAGE_SHARES = {
+    "x11_login": 0.3,
+    "x11_page": 0.25,
+    "gemini": 0.9,
+    "groupme": 1.0,
+}
+MIN_STAGE_SECONDS = 0.5
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline:
+    """Time budget for one chat command, handed down to every outbound call it makes."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, stage, required=True):
+        """
+        Socket timeout for the next `stage` call: its share of what's left, capped
+        at STAGE_TIMEOUTS. Once the budget is spent, records the stage and raises
+        DeadlineExceeded, or returns MIN_STAGE_SECONDS if the call isn't `required`
+        to fit (e.g. the final GroupMe reply still goes out).
+        """
+        left = self.remaining()
+        if left < MIN_STAGE_SECONDS:
+            record_metric("deadline_expired", stage)
+            if required:
+                raise DeadlineExceeded(stage)
+            return MIN_STAGE_SECONDS
+        return max(MIN_STAGE_SECONDS, min(STAGE_TIMEOUTS[stage], left * STAGE_SHARES[stage]))
+
+def stage_timeout(deadline, stage, required=True):
+    if deadline is None:
+        return STAGE_TIMEOUTS[stage]
+    return deadline.timeout(stage, required=required)
+
+# Upstream budgets as (requests, estimated tokens) per rolling minute and day; 0 = unlimited.
+# Defaults follow the Gemini free tier, whose quotas are per model: the "gemini" budget
+# applies to each "gemini:<model>" separately. X11 is only throttled per minute to stay polite.
+ADMISSION_BUDGETS = {
+    "gemini": {
+        60: (int(os.environ.get("GEMINI_RPM", 15)), int(os.environ.get("GEMINI_TPM", 1_000_000))),
+        86400: (int(os.environ.get("GEMINI_RPD", 1500)), int(os.environ.get("GEMINI_TPD", 0))),
+    },
+    "x11": {
+        60: (int(os.environ.get("X11_RPM", 120)), 0),
+        86400: (int(os.environ.get("X11_RPD", 0)), 0),
+    },
+}
+# Largest fraction of any budget one sender, or one command, may hold at a time
+SENDER_BUDGET_SHARE = float(os.environ.get("SENDER_BUDGET_SHARE", 0.4))
+COMMAND_BUDGET_SHARE = float(os.environ.get("COMMAND_BUDGET_SHARE", 0.6))
+# How long work may wait for per-minute capacity before it is rejected
+ADMISSION_QUEUE_SECONDS = float(os.environ.get("ADMISSION_QUEUE_SECONDS", 5))
+# Bot commands one sender may start per minute
+SENDER_COMMANDS_PER_MINUTE = int(os.environ.get("SENDER_COMMANDS_PER_MINUTE", 4))
+# Gemini output tokens charged up front, corrected from usageMetadata afterwards
+GEMINI_OUTPUT_TOKEN_ESTIMATE = 400
+# Which timed_request stages draw on which upstream budget
+STAGE_UPSTREAMS = {"x11_login": "x11", "x11_page": "x11"}
+
+# Who and what the current request is spending budget on (GroupMe sender_id, command)
+request_sender = contextvars.ContextVar("request_sender", default="-")
+request_command = contextvars.ContextVar("request_command", default="-")
+# GroupMe group the request came from, which picks the bot that replies
+request_group = contextvars.ContextVar("request_group", default=None)
+
+class UsageWindow:
+    """Requests and tokens admitted in the last `span` seconds, in total and per sender / command."""
+
+    def __init__(self, span):
+        self.span = span
+        self.entries = deque()  # tickets, oldest first
+        self.requests = {}  # None (total), ("sender", id) or ("command", name) -> count
+        self.tokens = {}
+
+    def prune(self, now):
+        while self.entries and self.entries[0]["at"] <= now - self.span:
+            self.apply(self.entries.popleft(), -1)
+
+    def apply(self, ticket, sign):
+        for key in (None, ("sender", ticket["sender"]), ("command", ticket["command"])):
+            self.requests[key] = self.requests.get(key, 0) + sign
+            self.tokens[key] = self.tokens.get(key, 0) + sign * ticket["tokens"]
+
+    def over(self, limits, sender, command, tokens):
+        """The first limit admitting this work would break ("requests", "sender_tokens", ...), or None."""
+        max_requests, max_tokens = limits
+        for scope, key, share in (
+            ("", None, 1.0),
+            ("sender_", ("sender", sender), SENDER_BUDGET_SHARE),
+            ("command_", ("command", command), COMMAND_BUDGET_SHARE),
+        ):
+            if max_requests and self.requests.get(key, 0) + 1 > max(1, int(max_requests * share)):
+                return f"{scope}requests"
+            if max_tokens and self.tokens.get(key, 0) + tokens > max(tokens, int(max_tokens * share)):
+                return f"{scope}tokens"
+        return None
+
+class AdmissionController:
+    """
+    Gatekeeper in front of Gemini and X11. Work is admitted while it fits the
+    upstream's per-minute and per-day budgets and the sender's and command's
+    share of them. Over a per-minute limit it waits (up to ADMISSION_QUEUE_SECONDS
+    or the deadline) for the window to slide; over a per-day limit, or after
+    waiting in vain, it's rejected and the caller degrades.
+    """
+
+    def __init__(self, budgets):
+        self.budgets = budgets
+        self.windows = {}  # upstream -> {span: UsageWindow}, see windows_for
+        self.changed = threading.Condition()
+
+    def budget_for(self, upstream):
+        """An upstream's own budget, else its family's ("gemini" for "gemini:<model>")."""
+        return self.budgets.get(upstream) or self.budgets[upstream.partition(":")[0]]
+
+    def windows_for(self, upstream):
+        """Usage windows of an upstream, created on first use. Call with self.changed held."""
+        if upstream not in self.windows:
+            self.windows[upstream] = {span: UsageWindow(span) for span in self.budget_for(upstream)}
+        return self.windows[upstream]
+
+    def admit(self, upstream, tokens=0, deadline=None):
+        """Returns a ticket (to settle() real usage against) or None if the work is rejected."""
+        sender, command = request_sender.get(), request_command.get()
+        wait_budget = ADMISSION_QUEUE_SECONDS
+        if deadline is not None:
+            wait_budget = min(wait_budget, deadline.remaining() * STAGE_SHARES.get(upstream.partition(":")[0], 0.25))
+        started = time.monotonic()
+        with self.changed:
+            while True:
+                now = time.time()
+                limit, retry_in = None, None
+                for span, window in self.windows_for(upstream).items():
+                    window.prune(now)
+                    limit = window.over(self.budget_for(upstream)[span], sender, command, tokens)
+                    if limit:
+                        retry_in = window.entries[0]["at"] + span - now if window.entries else None
+                        limit = f"{'minute' if span == 60 else 'day'}_{limit}"
+                        break
+                if not limit:
+                    ticket = {"at": now, "upstream": upstream, "sender": sender, "command": command, "tokens": tokens}
+                    for window in self.windows_for(upstream).values():
+                        window.entries.append(ticket)
+                        window.apply(ticket, 1)
+                    break
+                waited = time.monotonic() - started
+                if limit.startswith("day") or retry_in is None or waited + retry_in > wait_budget:
+                    record_metric("admission", f"{upstream}_rejected")
+                    record_metric("admission_limits", f"{upstream}_{limit}")
+                    log_event(
+                        logging.WARNING, "admission_rejected", f"🚦 {upstream} budget exhausted ({limit})",
+                        upstream=upstream, limit=limit, sender=sender, command=command, waited_ms=round(waited * 1000),
+                    )
+                    return None
+                self.changed.wait(timeout=retry_in + 0.01)
+
+        waited_ms = (time.monotonic() - started) * 1000
+        record_metric("admission", f"{upstream}_admitted")
+        if waited_ms >= 1:
+            record_metric("admission", f"{upstream}_queued")
+            record_metric("admission", f"{upstream}_queued_ms", waited_ms)
+        return ticket
+
+    def settle(self, ticket, tokens):
+        """Replaces a ticket's estimated token charge with what the upstream reports it used."""
+        if ticket is None or tokens == ticket["tokens"]:
+            return
+        now = time.time()
+        with self.changed:
+            live = []
+            for window in self.windows[ticket["upstream"]].values():
+                window.prune(now)
+                if ticket["at"] > now - window.span:
+                    window.apply(ticket, -1)
+                    live.append(window)
+            ticket["tokens"] = tokens
+            for window in live:
+                window.apply(ticket, 1)
+            self.changed.notify_all()
+
+    def usage(self):
+        """Current consumption per upstream and window, for /metrics."""
+        now = time.time()
+        with self.changed:
+            report = {}
+            for upstream, windows in self.windows.items():
+                for span, window in windows.items():
+                    window.prune(now)
+                    name = "minute" if span == 60 else "day"
+                    report[f"{upstream}_{name}_requests"] = window.requests.get(None, 0)
+                    report[f"{upstream}_{name}_tokens"] = window.tokens.get(None, 0)
+            return report
+
+admission = AdmissionController(ADMISSION_BUDGETS)
+
+# Commands let through per sender in the last minute: sender_id -> deque of timestamps
+sender_commands = {}
+# When each sender was last told to slow down: sender_id -> timestamp
+sender_refused_at = {}
+sender_commands_lock = threading.Lock()
+
+def begin_command(command, deadline=None):
+    """
+    Tags the request with its command (for per-command fairness) and applies the
+    per-sender command rate. Only allowed commands count, so a sender who keeps
+    retrying is locked out for one window, not indefinitely. Over the limit,
+    the sender gets one in-character brush-off per lockout and the command is
+    dropped.
+    """
+    request_command.set(command)
+    sender = request_sender.get()
+    now = time.time()
+    with sender_commands_lock:
+        recent = sender_commands.setdefault(sender, deque())
+        while recent and recent[0] <= now - 60:
+            recent.popleft()
+        allowed = len(recent) < SENDER_COMMANDS_PER_MINUTE
+        first_refusal = False
+        if allowed:
+            recent.append(now)
+        elif sender_refused_at.get(sender, 0) < recent[0]:
+            # Not told yet since the oldest command still holding the window
+            first_refusal = True
+            sender_refused_at[sender] = now
+    if allowed:
+        return True
+    record_metric("admission", f"{command}_sender_throttled")
+    log_event(logging.INFO, "command_throttled", "🚦 Sender over command rate", command=command, sender=sender)
+    if first_refusal:
+        send_groupme_message("Whoa whoa whoa, slow down playa. Taycan A. Schitt takes one question at a time. Holla at me in a minute.", deadline)
+    return False
+
+# Keep-alive connections kept per upstream host: enough for every Gemini worker plus
+# the webhook threads calling X11 / GroupMe at once. Extra connections are opened
+# under bursts but not kept.
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 16))
+# Gemini over HTTP/2 (one multiplexed connection) when httpx[http2] is installed
+GEMINI_HTTP2 = os.environ.get("GEMINI_HTTP2", "0") == "1"
+
+# Connections each pool had opened when we last looked, to count new ones per upstream
+pool_connections_seen = weakref.WeakKeyDictionary()
+pool_connections_lock = threading.Lock()
+
+def record_transport(upstream, wire_bytes, body_bytes, new_connections, http_version="HTTP/1.1"):
+    record_metric("transport", f"{upstream}_requests")
+    record_metric("transport", f"{upstream}_new_connections", new_connections)
+    record_metric("transport", f"{upstream}_wire_bytes", wire_bytes)
+    record_metric("transport", f"{upstream}_body_bytes", body_bytes)
+    record_metric("transport_http_versions", f"{upstream}_{http_version}")
+
+def count_transport(upstream, response):
+    """Response hook: bytes on the wire vs decoded, and whether the request needed a new connection."""
+    # We never stream, so reading the body here only moves it earlier
+    body_bytes = len(response.content)
+    wire_bytes = response.raw.tell() if hasattr(response.raw, "tell") else body_bytes
+    new_connections = 0
+    # The urllib3 pool that served the response; its num_connections only ever grows
+    pool = getattr(response.raw, "_pool", None)
+    if pool is not None:
+        with pool_connections_lock:
+            new_connections = pool.num_connections - pool_connections_seen.get(pool, 0)
+            pool_connections_seen[pool] = pool.num_connections
+    record_transport(upstream, wire_bytes, body_bytes, new_connections)
+
+def new_session(upstream):
+    """
+    requests.Session with a keep-alive pool of HTTP_POOL_SIZE per host and
+    transport accounting. Accept-Encoding is requests' default: gzip/deflate,
+    plus br when brotli is installed, which the big ASP.NET pages shrink well under.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(lambda response, *args, **kwargs: count_transport(upstream, response))
+    return session
+
+class Http2Session:
+    """The slice of requests.Session that timed_request uses, served by an httpx HTTP/2 client."""
+
+    def __init__(self, upstream):
+        import httpx
+        self.httpx = httpx
+        self.upstream = upstream
+        self.client = httpx.Client(
+            http2=True, limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        )
+
+    def request(self, method, url, timeout=None, **kwargs):
+        try:
+            response = self.client.request(method, url, timeout=timeout, **kwargs)
+        except self.httpx.TimeoutException as e:
+            raise requests.Timeout(str(e))
+        except self.httpx.HTTPError as e:
+            raise requests.RequestException(str(e))
+        # httpx doesn't say whether a connection was reused; on HTTP/2 it's one multiplexed connection
+        record_transport(self.upstream, response.num_bytes_downloaded, len(response.content), 0, response.http_version)
+        return response
+
+# One pooled session per API upstream ("gemini", "groupme", and anonymous "x11" pages).
+# Logged-in X11 sessions are separate new_session("x11") instances carrying the login cookies.
+upstream_sessions = {}
+upstream_sessions_lock = threading.Lock()
+
+def upstream_session(upstream):
+    with upstream_sessions_lock:
+        session = upstream_sessions.get(upstream)
+        if session is None:
+            if upstream == "gemini" and GEMINI_HTTP2:
+                try:
+                    session = Http2Session(upstream)
+                except ImportError as e:
+                    log_event(logging.WARNING, "http2_unavailable", f"⚠️ GEMINI_HTTP2 set but httpx[http2] isn't installed ({e}); using HTTP/1.1")
+            session = session or new_session(upstream)
+            upstream_sessions[upstream] = session
+    return session
+
+def transport_summary():
+    """Per upstream: share of requests that reused a kept-alive connection, and bytes saved by compression."""
+    with metrics_lock:
+        counters = dict(metrics.get("transport", {}))
+    summary = {}
+    for upstream in {name.split("_")[0] for name in counters}:
+        sent = counters.get(f"{upstream}_requests", 0)
+        wire, body = counters.get(f"{upstream}_wire_bytes", 0), counters.get(f"{upstream}_body_bytes", 0)
+        summary[upstream] = {
+            "connection_reuse": round(1 - counters.get(f"{upstream}_new_connections", 0) / sent, 3) if sent else None,
+            "bytes_saved": body - wire,
+            "compression_ratio": round(wire / body, 3) if body else None,
+        }
+    return summary
+
+def timed_request(method, url, stage, deadline=None, session=None, **kwargs):
+    """
+    requests call bounded by the stage's share of the deadline, on the given
+    session or the stage's pooled upstream session. Returns None (and logs)
+    on timeout, connection error, a spent deadline or when the upstream's
+    admission budget turns it away, so callers degrade the same way they do
+    for a bad status code.
+    """
+    upstream = STAGE_UPSTREAMS.get(stage)
+    if upstream and admission.admit(upstream, deadline=deadline) is None:
+        return None
+    try:
+        kwargs["timeout"] = stage_timeout(deadline, stage)
+        return (session or upstream_session(stage.split("_")[0])).request(method, url, **kwargs)
+    except DeadlineExceeded:
+        log_event(logging.WARNING, "deadline_spent", f"⌛ Deadline spent before {stage} call", stage=stage, url=url)
+    except requests.Timeout:
+        record_metric("stage_timeouts", stage)
+        log_event(logging.WARNING, "stage_timeout", f"⌛ {stage} call timed out", stage=stage, url=url, timeout_s=round(kwargs["timeout"], 1))
+    except requests.RequestException as e:
+        log_event(logging.WARNING, "request_failed", f"⚠️ {stage} call failed: {e}", stage=stage, url=url)
+    return None
+
+# Last parse of each X11 page fragment, reused while the fragment is byte-identical.
+# (page_type, url) -> {"fingerprint", "result"}
+parsed_pages = {}
+parsed_pages_lock = threading.Lock()
+# Last 200 body of each X11 page that came with validators, so a 304 can be answered from memory.
+# url -> {"text", "etag", "last_modified"}
+x11_pages = {}
+x11_pages_lock = threading.Lock()
+
+TABLE_TAG_RE = re.compile(r"<(/?)table\b", re.IGNORECASE)
+
+# In-flight and just-finished crawls, shared by every command, league and bot that asks
+# for the same page. key -> {"done": Event, "result", "done_at"}
+crawls = {}
+crawls_lock = threading.Lock()
+CRAWL_FRESH_SECONDS = float(os.environ.get("CRAWL_FRESH_SECONDS", 30))
+
+def single_flight(key, fetch, deadline=None, keep=bool):
+    """
+    Runs fetch() once for all concurrent callers with the same key and hands
+    its result to each of them; a result that passes keep() is reused for
+    CRAWL_FRESH_SECONDS more, so one command's standings, fixtures and results
+    lookups (or two bots asking at once) cost one request.
+    """
+    with crawls_lock:
+        entry = crawls.get(key)
+        leader = not (entry and (not entry["done"].is_set() or time.monotonic() - entry["done_at"] < CRAWL_FRESH_SECONDS))
+        if leader:
+            now = time.monotonic()
+            for stale in [k for k, e in crawls.items() if e["done"].is_set() and now - e["done_at"] >= CRAWL_FRESH_SECONDS]:
+                del crawls[stale]
+            entry = {"done": threading.Event(), "result": None, "done_at": 0}
+            crawls[key] = entry
+    if not leader:
+        record_metric("crawls", f"{key[0]}_shared")
+        wait = deadline.remaining() if deadline is not None else STAGE_TIMEOUTS["x11_page"]
+        return entry["result"] if entry["done"].wait(timeout=max(0, wait)) else None
+
+    record_metric("crawls", f"{key[0]}_fetched")
+    try:
+        entry["result"] = fetch()
+    finally:
+        # A failed fetch (or one that raised) is handed to the callers already
+        # waiting, but not reused; followers must be released whatever happens
+        try:
+            kept = entry["result"] is not None and keep(entry["result"])
+        except Exception:
+            kept = False
+        entry["done_at"] = time.monotonic() if kept else float("-inf")
+        entry["done"].set()
+    return entry["result"]
+
+def conditional_x11_get(session, url, deadline=None):
+    """
+    GET with If-None-Match / If-Modified-Since from the last 200 (when the
+    server sent validators). Returns (status, text); a 304 comes back as
+    (200, the remembered body). (None, None) when the request failed.
+    """
+    with x11_pages_lock:
+        previous = x11_pages.get(url)
+    headers = {}
+    if previous:
+        if previous["etag"]:
+            headers["If-None-Match"] = previous["etag"]
+        if previous["last_modified"]:
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    response = timed_request("GET", url, "x11_page", deadline, session, headers=headers)
+    if response is None:
+        return None, None
+    if response.status_code == 304 and previous:
+        record_metric("x11_conditional", "not_modified")
+        return 200, previous["text"]
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if response.status_code == 200 and (etag or last_modified):
+        record_metric("x11_conditional", "modified")
+        with x11_pages_lock:
+            x11_pages[url] = {"text": response.text, "etag": etag, "last_modified": last_modified}
+    return response.status_code, response.text
+
+def fetch_x11_page(session, url, deadline=None):
+    """conditional_x11_get, deduplicated across concurrent and back-to-back callers. Returns (status, text)."""
+    # Logged-in and anonymous views of a page differ (e.g. standings), so they're crawled separately
+    key = ("page", url, getattr(session, "x11_logged_in", False))
+    result = single_flight(key, lambda: conditional_x11_get(session, url, deadline), deadline, keep=lambda r: r is not None and r[0] == 200)
+    return result or (None, None)
+
+def extract_table_fragment(html, table_id):
+    """The <table id=table_id>...</table> slice of the page, found by string search (no tree), or None."""
+    id_at = html.find(f'id="{table_id}"')
+    if id_at < 0:
+        return None
+    start = html.rfind("<table", 0, id_at)
+    if start < 0:
+        return None
+    depth = 0
+    for tag in TABLE_TAG_RE.finditer(html, start):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return html[start:html.find(">", tag.end()) + 1]
+    return html[start:]
+
+def extract_marked_rows(html, marker):
+    """The <tr>...</tr> rows containing marker, joined into one <table>, or None if there are none."""
+    rows = []
+    at = html.find(marker)
+    while at >= 0:
+        start = html.rfind("<tr", 0, at)
+        end = html.find("</tr>", at)
+        if start < 0 or end < 0:
+            break
+        rows.append(html[start:end + len("</tr>")])
+        at = html.find(marker, end)
+    return "<table>" + "".join(rows) + "</table>" if rows else None
+
+def fetch_x11_fragment(session, url, page_type, table_id=None, deadline=None, rows_with=None):
+    """
+    Fetches an X11 page (shared, conditional) and fingerprints only what we
+    parse: the table_id table, or the rows containing rows_with for tables
+    without an id. Page-wide noise (ASP.NET __VIEWSTATE and friends) doesn't
+    count. Returns (status, fragment, cached_result): cached_result is the
+    previous parse when the fragment hash is unchanged, so the caller can
+    skip BeautifulSoup entirely.
+    """
+    status, text = fetch_x11_page(session, url, deadline)
+    if status != 200:
+        return status, None, None
+
+    if table_id is not None:
+        fragment = extract_table_fragment(text, table_id)
+    elif rows_with is not None:
+        fragment = extract_marked_rows(text, rows_with)
+    else:
+        fragment = text
+    if fragment is None:
+        return status, None, None
+    fingerprint = hashlib.sha256(fragment.encode("utf-8")).hexdigest()
+    with parsed_pages_lock:
+        previous = parsed_pages.get((page_type, url))
+    if previous and previous["fingerprint"] == fingerprint:
+        record_metric("x11_parse_skips", f"{page_type}_unchanged")
+        return status, fragment, previous["result"]
+    return status, fragment, None
+
+def remember_parse(page_type, url, fragment, result):
+    """Stores a parse for fetch_x11_fragment to hand back while the fragment stays the same."""
+    with parsed_pages_lock:
+        parsed_pages[(page_type, url)] = {
+            "fingerprint": hashlib.sha256(fragment.encode("utf-8")).hexdigest(),
+            "result": result,
+        }
+    record_metric("x11_parses", page_type)
+
+with open(PROFILES_PATH, "r") as f:
     profiles = json.load(f)
+profiles_mtime = os.path.getmtime(PROFILES_PATH)
 
 def normalize(text):
     """Lowercases, removes accents, and strips special characters for reliable comparison."""
@@ -47,39 +811,227 @@ def build_team_name_mapping(profiles):
 
 team_mapping = build_team_name_mapping(profiles)
 
+def refresh_profiles():
+    """Reloads profiles.json (and the team mapping built from it) if the file changed on disk."""
+    global profiles, profiles_mtime, team_mapping
+    try:
+        mtime = os.path.getmtime(PROFILES_PATH)
+        if mtime == profiles_mtime:
+            return False
+        with open(PROFILES_PATH, "r") as f:
+            profiles = json.load(f)
+    except Exception as e:
+        log_event(logging.WARNING, "profiles_reload_failed", f"⚠️ Could not reload {PROFILES_PATH}: {e}")
+        return False
+    profiles_mtime = mtime
+    team_mapping = build_team_name_mapping(profiles)
+    index_profile_teams(team_mapping)
+    log_event(logging.INFO, "profiles_reloaded", f"🔄 Reloaded {PROFILES_PATH}")
+    return True
+
 def resolve_team_name(text, team_mapping):
+    """Exact alias match anywhere in the text first, then the fuzzy team index (typos, partial names)."""
     text = text.strip().lower()
     for alias, official_name in team_mapping.items():
         if alias in normalize(text):
             return official_name
-    return None
+    return fuzzy_resolve_team(text)
+
+class NameIndex:
+    """
+    Character-trigram index over team names, aliases and players. Lookups
+    only score entries sharing a trigram with the query (Dice coefficient),
+    so they stay well under a millisecond at league size. Entries can be
+    added at any time; the same (kind, name) is only indexed once.
+    """
 
-def send_groupme_message(text):
-    url = "https://api.groupme.com/v3/bots/post"
+    def __init__(self):
+        self.entries = []  # {"name", "key", "kind", "target", "source", "info"}
+        self.by_key = {}  # (kind, key) -> entry id
+        self.postings = {}  # trigram -> set of entry ids
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def trigrams(key):
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, name, kind, target=None, source=None, **info):
+        key = normalize(name).strip()
+        if not key:
+            return
+        with self.lock:
+            existing = self.by_key.get((kind, key))
+            if existing is not None:
+                entry = self.entries[existing]
+                if entry is not None:
+                    entry["info"].update(info)
+                    return
+            entry_id = len(self.entries)
+            self.entries.append({
+                "name": name, "key": key, "kind": kind,
+                "target": target or name, "source": source, "info": info,
+                "grams": self.trigrams(key),
+            })
+            self.by_key[(kind, key)] = entry_id
+            for gram in self.entries[entry_id]["grams"]:
+                self.postings.setdefault(gram, set()).add(entry_id)
+
+    def discard_source(self, source):
+        with self.lock:
+            for entry_id, entry in enumerate(self.entries):
+                if entry is not None and entry["source"] == source:
+                    for gram in entry["grams"]:
+                        self.postings.get(gram, set()).discard(entry_id)
+                    del self.by_key[(entry["kind"], entry["key"])]
+                    self.entries[entry_id] = None
+
+    def search(self, query, kind=None, limit=5, min_score=0.0):
+        """Returns up to `limit` matches as dicts (name, target, kind, score, info), best first."""
+        query_grams = self.trigrams(normalize(query).strip())
+        hits = {}
+        with self.lock:
+            for gram in query_grams:
+                for entry_id in self.postings.get(gram, ()):
+                    hits[entry_id] = hits.get(entry_id, 0) + 1
+            scored = []
+            for entry_id, shared in hits.items():
+                entry = self.entries[entry_id]
+                if kind and entry["kind"] != kind:
+                    continue
+                score = 2 * shared / (len(query_grams) + len(entry["grams"]))
+                if score >= min_score:
+                    scored.append((score, entry))
+        scored.sort(key=lambda item: -item[0])
+        return [
+            {"name": e["name"], "target": e["target"], "kind": e["kind"], "score": round(s, 3), "info": dict(e["info"])}
+            for s, e in scored[:limit]
+        ]
+
+    def export(self, kind):
+        with self.lock:
+            return [
+                {"name": e["name"], "target": e["target"], "info": e["info"]}
+                for e in self.entries if e is not None and e["kind"] == kind and e["source"] != "profiles"
+            ]
+
+name_index = NameIndex()
+
+# Minimum Dice score for a fuzzy match to count as the team someone meant
+FUZZY_TEAM_MIN_SCORE = float(os.environ.get("FUZZY_TEAM_MIN_SCORE", 0.55))
+# Words in a chat command that are never part of a team name
+COMMAND_WORDS = {
+    "taycan", "a", "schitt", "highlight", "highlights", "recap", "preview", "update", "the", "for", "of",
+    "me", "give", "game", "match", "last", "please", "pls", "yo", "what", "whats", "about", "vs", "and",
+}
+
+def index_profile_teams(team_mapping):
+    name_index.discard_source("profiles")
+    for alias, official_name in team_mapping.items():
+        name_index.add(alias, "team", target=official_name, source="profiles")
+
+index_profile_teams(team_mapping)
+
+def fuzzy_resolve_team(text):
+    """Best fuzzy team match over 1-3 word windows of the message (minus command words), or None."""
+    words = [w for w in normalize(text).split() if w not in COMMAND_WORDS]
+    best = None
+    for size in (3, 2, 1):
+        for i in range(len(words) - size + 1):
+            window = " ".join(words[i:i + size])
+            if len(window) < 3:
+                continue
+            for match in name_index.search(window, kind="team", limit=1, min_score=FUZZY_TEAM_MIN_SCORE):
+                if best is None or match["score"] > best["score"]:
+                    best = match
+    return best["target"] if best else None
+
+def canonical_team(name):
+    """Maps a team name as written anywhere (profiles, X11 pages, aliases, typos) to one comparable key."""
+    key = normalize(name)
+    official = team_mapping.get(key)
+    if not official:
+        match = name_index.search(name, kind="team", limit=1, min_score=0.8)
+        official = match[0]["target"] if match else name
+    return normalize(official)
+
+def same_team(a, b):
+    return normalize(a) == normalize(b) or canonical_team(a) == canonical_team(b)
+
+def find_players(query, limit=5):
+    """Fuzzy player lookup over every lineup parsed so far."""
+    return name_index.search(query, kind="player", limit=limit, min_score=0.3)
+
+def send_groupme_message(text, deadline=None):
+    url = f"{GROUPME_API_URL}/bots/post"
     
     # ✅ Enforce 1000 character limit
     if len(text) > 1000:
         text = text[:997] + "..."
 
     payload = {
-        "bot_id": GROUPME_BOT_ID,
+        "bot_id": GROUPME_BOTS.get(request_group.get(), GROUPME_BOT_ID),
         "text": text
     }
-    response = requests.post(url, json=payload)
+    # The reply is the point of the command, so it still goes out on a spent deadline
+    try:
+        response = upstream_session("groupme").request("POST", url, json=payload, timeout=stage_timeout(deadline, "groupme", required=False))
+    except requests.RequestException as e:
+        log_event(logging.ERROR, "groupme_send_failed", f"⚠️ Failed to send message to GroupMe: {e}")
+        return
     if response.status_code != 202:
-        sys.stderr.write(f"⚠️ Failed to send message to GroupMe: {response.status_code} {response.text}\n")
+        log_event(logging.ERROR, "groupme_send_failed", "⚠️ Failed to send message to GroupMe", status=response.status_code, body=response.text[:200])
 
-def get_logged_in_session():
-    login_url = "https://www.xperteleven.com/front_new3.aspx"
-    session = requests.Session()
-    login_page = session.get(login_url)
+# "cookies" holds a session restored from the warm state until it's first needed
+x11_session_cache = {"session": None, "cookies": None, "logged_in_at": 0}
+x11_session_lock = threading.Lock()
+
+def invalidate_x11_session():
+    """
+    Drops the shared X11 session, e.g. when a page comes back without its data
+    (logged out), along with the logged-in page crawls it produced, so the next
+    session fetches those pages afresh instead of reusing the logged-out body.
+    """
+    with x11_session_lock:
+        x11_session_cache["session"] = None
+        x11_session_cache["cookies"] = None
+    with crawls_lock:
+        for key in [k for k in crawls if k[0] == "page" and k[2]]:
+            del crawls[key]
+
+def get_logged_in_session(deadline=None):
+    """Returns the shared logged-in X11 session, logging in again once it's older than X11_SESSION_TTL_SECONDS."""
+    with x11_session_lock:
+        fresh = time.time() - x11_session_cache["logged_in_at"] < X11_SESSION_TTL_SECONDS
+        if fresh and x11_session_cache["session"] is None and x11_session_cache["cookies"]:
+            x11_session_cache["session"] = new_session("x11")
+            x11_session_cache["session"].cookies.update(x11_session_cache["cookies"])
+            x11_session_cache["session"].x11_logged_in = True
+        x11_session_cache["cookies"] = None
+        session = x11_session_cache["session"]
+        if session is not None and fresh:
+            return session
+
+    session = login_x11_session(deadline)
+    if session is not None:
+        with x11_session_lock:
+            x11_session_cache["session"] = session
+            x11_session_cache["logged_in_at"] = time.time()
+    return session
+
+def login_x11_session(deadline=None):
+    login_url = f"{X11_BASE_URL}/front_new3.aspx"
+    session = new_session("x11")
+    login_page = timed_request("GET", login_url, "x11_login", deadline, session)
+    if login_page is None:
+        return None
     login_soup = BeautifulSoup(login_page.text, "html.parser")
     try:
         viewstate = login_soup.find("input", {"id": "__VIEWSTATE"})["value"]
         viewstategen = login_soup.find("input", {"id": "__VIEWSTATEGENERATOR"})["value"]
         eventvalidation = login_soup.find("input", {"id": "__EVENTVALIDATION"})["value"]
     except Exception:
-        sys.stderr.write("⚠️ Could not find login form hidden fields.\n")
+        log_event(logging.WARNING, "x11_login_failed", "⚠️ Could not find login form hidden fields.")
         return None
 
     login_payload = {
@@ -91,18 +1043,19 @@ def get_logged_in_session():
         "ctl00$cphMain$FrontControl$lwLogin$btnLogin": "Login"
     }
 
-    login_response = session.post(login_url, data=login_payload)
-    if "Logout" not in login_response.text:
-        sys.stderr.write("⚠️ Login to Xpert Eleven failed.\n")
+    login_response = timed_request("POST", login_url, "x11_login", deadline, session, data=login_payload)
+    if login_response is None or "Logout" not in login_response.text:
+        log_event(logging.WARNING, "x11_login_failed", "⚠️ Login to Xpert Eleven failed.")
         return None
+    session.x11_logged_in = True
     return session
 
-def scrape_match_html(session, url):
-    response = session.get(url)
-    if response.status_code != 200:
-        sys.stderr.write(f"⚠️ Failed to get match page: {response.status_code}\n")
+def scrape_match_html(session, url, deadline=None):
+    status, text = fetch_x11_page(session, url, deadline)
+    if status != 200:
+        log_event(logging.WARNING, "x11_fetch_failed", "⚠️ Failed to get match page", url=url, status=status)
         return None
-    return response.text
+    return text
 
 def parse_match_data(soup):  # 💡 Changed from HTML string to BeautifulSoup object
     try:
@@ -111,7 +1064,7 @@ def parse_match_data(soup):  # 💡 Changed from HTML string to BeautifulSoup ob
         home_score = soup.find("span", id="ctl00_cphMain_lblHomeScore").text.strip()
         away_score = soup.find("span", id="ctl00_cphMain_lblAwayScore").text.strip()
     except Exception:
-        sys.stderr.write("⚠️ Failed to parse teams and score\n")
+        log_event(logging.WARNING, "match_parse_failed", "⚠️ Failed to parse teams and score")
         home_team = away_team = home_score = away_score = "N/A"
 
     try:
@@ -120,7 +1073,7 @@ def parse_match_data(soup):  # 💡 Changed from HTML string to BeautifulSoup ob
         venue = soup.find("span", id="ctl00_cphMain_lblArena").text.strip()
         referee = soup.find("span", id="ctl00_cphMain_lblReferee").text.strip()
     except Exception:
-        sys.stderr.write("⚠️ Failed to parse match info\n")
+        log_event(logging.WARNING, "match_parse_failed", "⚠️ Failed to parse match info")
         round_info = league = venue = referee = "N/A"
 
     return {
@@ -134,98 +1087,386 @@ def parse_match_data(soup):  # 💡 Changed from HTML string to BeautifulSoup ob
         "referee": referee,
     }
 
-def parse_match_events(soup):
-    events = []
-    impactful_players = set()
-    substitute_events = []
-
-    # Collect all event rows
-    event_rows = soup.find_all("tr", class_="ItemStyle2")
+# One compiled pass over each event description. Each named group is a kind;
+# finditer collects every kind mentioned and EVENT_KIND_PRIORITY picks the
+# primary one (a "disallowed goal" is a disallowed event, not a goal).
+# Substitutions also carry their direction: after "sub_by" ("X is substituted
+# by Y") the player coming on is named after the phrase, after "sub" ("X subbed
+# in for Y") before it.
+EVENT_KIND_RE = re.compile(
+    r"(?P<disallowed>disallowed)"
+    r"|(?P<penalty>penalt(?:y|ies))"
+    r"|(?P<red_card>red card|sent off)"
+    r"|(?P<yellow_card>yellow card)"
+    r"|(?P<injury>injur(?:ed|y))"
+    r"|(?P<sub_by>substituted by|replaced by)"
+    r"|(?P<sub>subbed in|comes on|came on|substitut)"
+    r"|(?P<goal>\bgoals?\b(?!\s+kick))"
+    r"|(?P<assist>assist)",
+    re.IGNORECASE,
+)
+EVENT_KIND_PRIORITY = ["disallowed", "goal", "penalty", "card", "injury", "sub", "assist"]
+EVENT_TAG_KINDS = {"red_card": "card", "yellow_card": "card"}
+EVENT_GROUP_TAGS = {"sub_by": "sub"}
+REFEREE_EVENT_TAGS = {"yellow_card", "red_card", "penalty", "disallowed"}
+IMPACTFUL_EVENT_TAGS = {"goal", "assist", "injury", "red_card"}
+
+GRADE_RE = re.compile(r"\(Grade:\s*\d+\)")
+MINUTE_RE = re.compile(r"\d+")
+SCORE_RE = re.compile(r"(\d+)\s*-\s*(\d+)")
+
+def lineup_name_matcher(names):
+    """
+    Compiles one regex over the parsed lineup: full names, plus surnames that
+    belong to a single player. Returns (regex, {matched text: full name}) or None.
+    """
+    lookup = {}
+    surnames = {}
+    for name in names:
+        lookup[name.lower()] = name
+        surname = name.split()[-1]
+        surnames.setdefault(surname.lower(), set()).add(name)
+    for surname, owners in surnames.items():
+        if len(owners) == 1:
+            lookup.setdefault(surname, next(iter(owners)))
+    if not lookup:
+        return None
+    alternatives = sorted(lookup, key=len, reverse=True)
+    regex = re.compile(r"\b(?:" + "|".join(re.escape(a) for a in alternatives) + r")\b", re.IGNORECASE)
+    return regex, lookup
 
-    for row in event_rows:
-        minute_td = row.find("span", id=lambda x: x and "lblEventTime" in x)
-        minute = minute_td.text.strip() if minute_td else "?"
+def player_mentions(desc, lineup=None):
+    """(offset, full name) for every lineup player mentioned in an event description."""
+    if not lineup:
+        return []
+    regex, lookup = lineup
+    return [(match.start(), lookup[match.group(0).lower()]) for match in regex.finditer(desc)]
+
+def extract_player_names(desc, lineup=None):
+    """Returns the lineup players mentioned in an event description, in order of mention."""
+    names = []
+    for _, name in player_mentions(desc, lineup):
+        if name not in names:
+            names.append(name)
+    return names
+
+def incoming_player(sub_match, mentions):
+    """The player a substitution brings on, read from which side of the sub phrase they're named on."""
+    before = [name for at, name in mentions if at < sub_match.start()]
+    after = [name for at, name in mentions if at >= sub_match.end()]
+    if sub_match.lastgroup == "sub_by":
+        return after[0] if after else None
+    # "X subbed in for Y"; a bare "Substitution: X for Y" names the incoming player first after it
+    return before[-1] if before else (after[0] if after else None)
+
+def classify_match_event(minute_text, desc, score_text, running_score=None, lineup=None):
+    """
+    Turns one event row into a structured record:
+    minute, kind, tags, players, player_in (substitutions only), score
+    (running), text. lineup is a lineup_name_matcher result; players are
+    only taken from it.
+    """
+    desc = GRADE_RE.sub("", desc).strip()
 
-        desc_td = row.find("span", id=lambda x: x and "lblEventDesc" in x)
-        desc = desc_td.text.strip() if desc_td else ""
+    kind_matches = list(EVENT_KIND_RE.finditer(desc))
+    tags = sorted({EVENT_GROUP_TAGS.get(m.lastgroup, m.lastgroup) for m in kind_matches})
+    kinds = {EVENT_TAG_KINDS.get(tag, tag) for tag in tags}
+    kind = next((k for k in EVENT_KIND_PRIORITY if k in kinds), "other")
 
-        score_td = row.find_all("td")[2] if len(row.find_all("td")) > 2 else None
-        score = score_td.text.strip() if score_td else ""
+    minute_match = MINUTE_RE.search(minute_text)
+    score_match = SCORE_RE.search(score_text)
+    if score_match:
+        running_score = (int(score_match.group(1)), int(score_match.group(2)))
 
-        # Clean grades from description
-        desc = re.sub(r"\(Grade:\s*\d+\)", "", desc)
+    text = f"{minute_text}' - {desc}"
+    if score_text:
+        text += f" (Score: {score_text})"
 
-        event_text = f"{minute}' - {desc.strip()}"
-        if score:
-            event_text += f" (Score: {score})"
+    mentions = player_mentions(desc, lineup)
+    sub_match = next((m for m in kind_matches if m.lastgroup in ("sub", "sub_by")), None)
 
-        # Check if it's a sub — temporarily hold it
-        if "subbed in" in desc.lower() or "substituted" in desc.lower():
-            substitute_events.append((desc, event_text))
-            continue
+    return {
+        "minute": int(minute_match.group(0)) if minute_match else None,
+        "kind": kind,
+        "tags": tags,
+        "players": extract_player_names(desc, lineup),
+        "player_in": incoming_player(sub_match, mentions) if kind == "sub" and sub_match else None,
+        "score": running_score,
+        "text": text,
+    }
 
-        # Check if it's an impactful event
-        if any(keyword in desc.lower() for keyword in ["goal", "assist", "injured", "red card", "sent off"]):
-            # Extract player names from description
-            for word in desc.split():
-                if word[0].isupper():
-                    impactful_players.add(word)
-            events.append(event_text)
-        else:
-            events.append(event_text)
+def parse_match_events(soup, player_names=()):
+    """
+    Returns the match's event records, dropping substitutions for subs who made
+    no impact. player_names is the parsed lineup used to tag event players.
+    """
+    lineup = lineup_name_matcher(player_names)
+    events = []
+    impactful_players = set()
+    running_score = None
 
-    # Reinsert only the sub events where the sub made an impact
-    for desc, event_text in substitute_events:
-        subbed_in_player = extract_player_name_from_desc(desc)
-        if subbed_in_player and subbed_in_player in impactful_players:
-            events.append(event_text)
+    for row in soup.find_all("tr", class_="ItemStyle2"):
+        minute_td = row.find("span", id=lambda x: x and "lblEventTime" in x)
+        minute = minute_td.text.strip() if minute_td else "?"
 
-    return events
+        desc_td = row.find("span", id=lambda x: x and "lblEventDesc" in x)
+        desc = desc_td.text.strip() if desc_td else ""
 
-def extract_player_name_from_desc(desc):
-    # crude way to pull a name from a substitution string
-    match = re.search(r"([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)", desc)
-    return match.group(1).strip() if match else None
+        tds = row.find_all("td")
+        score = tds[2].text.strip() if len(tds) > 2 else ""
+
+        event = classify_match_event(minute, desc, score, running_score, lineup)
+        running_score = event["score"]
+        if IMPACTFUL_EVENT_TAGS.intersection(event["tags"]):
+            impactful_players.update(event["players"])
+        events.append(event)
+
+    # Keep a sub only when the player coming on shows up in an impactful event
+    return [e for e in events if e["kind"] != "sub" or e["player_in"] in impactful_players]
+
+RECAP_PERSONA = (
+    "You are Taycan A. Schitt, a studio TV analyst for soccer channel FoxSportsGoon. You give exciting post-match recaps focusing on key match events.\n\n"
+    "Talk in a slight african american accent.\n"
+    "Describe goals in detail.\n"
+    "Include who was the man of the match for the winning team.\n"
+    "Keep it short and exciting, as if you were presenting highlights on TV. Remeber to speak about the events in the past-tense and highlight shifts in momentum and drama."
+    "Refer to the timing of moments using phrases like 'in the 36th minute', 'just before halftime', 'early in the second half', etc.\n"
+    "Only annotate players the first time they are mentioned using this format: Name (Position, Grade 📊).\n"
+    "Don't repeat the annotations. Don't mention 'Grade:' or use rating scales like 8/10.\n\n"
+)
+
+PREVIEW_PERSONA = (
+    "You are Taycan A. Schitt, a studio TV analyst for FoxSportsGoon. You provide exciting, insightful **match previews** for upcoming soccer games.\n\n"
+    "Talk in a slight African American accent.\n"
+    "ALWAYS keep your previews between 990-1000 characters. NEVER go above 1000.\n"
+    "Use the current league standings (place, wins, draws, losses, goals for, goals against, goal difference, and points) as context for your analysis.\n"
+    "Include recent form based on the last match result and key player performances.\n"
+    "Make predictions and build excitement for the upcoming game.\n"
+    "Use full player names and their performance rating in the format (position, grade 📊) the first time they are mentioned when relevant.\n.\n"
+    "Keep it engaging as a TV preview.\n\n"
+    "If a team has no recent match, they had a bye round, just use standings in your analysis for them.\n\n"
+)
+
+PERSONAS = {
+    "recap": RECAP_PERSONA,
+    "preview": PREVIEW_PERSONA,
+}
+
+# Input token budget per Gemini command, overridable per deploy. The persona
+# (system instruction) doesn't count; the match's manager profiles do.
+PROMPT_TOKEN_BUDGETS = {
+    "recap": int(os.environ.get("GEMINI_RECAP_TOKEN_BUDGET", 450)),
+    "preview": int(os.environ.get("GEMINI_PREVIEW_TOKEN_BUDGET", 250)),
+}
+
+# Lower rank = kept first when a prompt is over budget
+EVENT_KIND_RANK = {"goal": 0, "disallowed": 1, "penalty": 1, "card": 2, "injury": 2, "assist": 2, "sub": 3, "other": 5}
+# Who's being roasted ranks just behind the goals
+PROFILE_RANK = 1
+
+def estimate_tokens(text):
+    """Cheap Gemini token estimate (~4 characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+def event_rank(event):
+    if "red_card" in event["tags"]:
+        return 1
+    return EVENT_KIND_RANK.get(event["kind"], 5)
+
+def player_rank(player):
+    """Top-graded players rank first; ungraded players rank last."""
+    if not player["grade"]:
+        return 9
+    return max(0, 10 - player["grade"]) / 2
+
+def build_budgeted_prompt(command, lines):
+    """
+    lines: (rank, text) pairs in display order. rank None means always keep.
+    Ranked lines are admitted best-first until the command's token budget
+    is spent; admitted lines keep their original order.
+    """
+    budget = PROMPT_TOKEN_BUDGETS.get(command)
+    used = sum(estimate_tokens(text) + 1 for rank, text in lines if rank is None)
+
+    kept = set()
+    ranked = sorted((rank, i) for i, (rank, text) in enumerate(lines) if rank is not None)
+    for rank, i in ranked:
+        cost = estimate_tokens(lines[i][1]) + 1
+        if budget is not None and used + cost > budget:
+            continue
+        kept.add(i)
+        used += cost
+
+    prompt = "\n".join(text for i, (rank, text) in enumerate(lines) if rank is None or i in kept)
+    dropped = len(ranked) - len(kept)
+    if dropped:
+        full_tokens = sum(estimate_tokens(text) + 1 for rank, text in lines)
+        log_event(
+            logging.INFO, "prompt_trimmed", f"✂️ {command} prompt trimmed {dropped} lines",
+            command=command, budget=budget, full_tokens=full_tokens,
+            sent_tokens=estimate_tokens(prompt), saved_tokens=full_tokens - estimate_tokens(prompt),
+        )
+    return prompt
 
 def format_gemini_prompt(match_data, events, player_grades):
-    events_text = "\n".join(events)
-    referee_events = [e for e in events if any(keyword in e.lower() for keyword in ["yellow card", "red card", "penalty", "disallowed goal"])]
-    referee_events_text = "\n".join(referee_events) if referee_events else "No significant referee interventions."
-
-    # Build the player grades section
-    ratings_lines = []
-    for p in player_grades:
-        if p["grade"]:  # only include rated players
-            line = f"{p['name']} ({p['position']}, {p['grade']} 📊)"
-            ratings_lines.append(line)
-    ratings_text = "\n".join(ratings_lines) if ratings_lines else "No player ratings available."
+    referee_events = [e for e in events if REFEREE_EVENT_TAGS.intersection(e["tags"])]
+    rated_players = [p for p in player_grades if p["grade"]]  # only include rated players
+
+    lines = profile_lines((match_data["home_team"], match_data["away_team"]))
+    lines += [
+        (None, f"Match: {match_data['home_team']} vs {match_data['away_team']}"),
+        (None, f"Score: {match_data['home_score']} - {match_data['away_score']}\n"),
+        (None, "Match Events:"),
+    ]
+    # Referee events are marked in place rather than listed (and paid for) twice
+    lines += [
+        (event_rank(e), e["text"] + (" [ref]" if e in referee_events else ""))
+        for e in events
+    ]
+    lines.append((None, f"\nReferee: {match_data['referee']}"))
+    if referee_events:
+        lines.append((None, "Referee-related events are marked [ref] in Match Events."))
+    else:
+        lines.append((None, "No significant referee interventions."))
 
     # Prompt Gemini with instruction to annotate the first mention only
-    prompt = (
-        f"You are Taycan A. Schitt, a studio TV analyst for soccer channel FoxSportsGoon. You give exciting post-match recaps focusing on key match events.\n\n"
-        f"Talk in a slight african american accent.\n"
-        f"Describe goals in detail.\n"
-        f"Include who was the man of the match for the winning team.\n"
-        f"Keep it short and exciting, as if you were presenting highlights on TV. Remeber to speak about the events in the past-tense and highlight shifts in momentum and drama."
-        f"Refer to the timing of moments using phrases like 'in the 36th minute', 'just before halftime', 'early in the second half', etc.\n"
-        f"Only annotate players the first time they are mentioned using this format: Name (Position, Grade 📊).\n"
-        f"Don't repeat the annotations. Don't mention 'Grade:' or use rating scales like 8/10.\n\n"
-        f"Match: {match_data['home_team']} vs {match_data['away_team']}\n"
-        f"Score: {match_data['home_score']} - {match_data['away_score']}\n\n"
-        f"Match Events:\n{events_text}\n\n"
-        f"Referee: {match_data['referee']}\n"
-        f"Referee-related events:\n{referee_events_text}\n\n"
-        f"Player Grades (use this info to annotate players the FIRST time they are mentioned only):\n{ratings_text}\n\n"
-    )
+    lines.append((None, "\nPlayer Grades (use this info to annotate players the FIRST time they are mentioned only):"))
+    if rated_players:
+        lines += [(player_rank(p), f"{p['name']} ({p['position']}, {p['grade']} 📊)") for p in rated_players]
+    else:
+        lines.append((None, "No player ratings available."))
 
-    return prompt
+    return build_budgeted_prompt("recap", lines) + "\n\n"
 
-def call_gemini_api(prompt):
-    import json  # make sure this is imported at the top
-    headers = {
+def match_profiles(teams):
+    """The profiles.json entries managing any of `teams`."""
+    refresh_profiles()
+    return {
+        key: profile for key, profile in profiles.items()
+        if profile.get("team") and any(same_team(profile["team"], team) for team in teams)
+    }
+
+def profile_lines(teams):
+    """Budget lines introducing the managers of `teams`, so the persona knows who it's roasting."""
+    lines = []
+    for profile in match_profiles(teams).values():
+        trophies = ", ".join(f"{title} x{count}" for title, count in profile.get("trophies", {}).items()) or "none"
+        lines.append((PROFILE_RANK,
+            f"Manager of {profile['team']}: {profile.get('chat_handle', '?')}. {profile.get('description', '')} "
+            f"Trophies: {trophies}. Tone: {profile.get('tone_directive', '')}"
+        ))
+    if lines:
+        lines.append((None, ""))
+    return lines
+
+def gemini_system_instruction(persona):
+    return PERSONAS[persona]
+
+def gemini_headers():
+    return {
         "Content-Type": "application/json",
         "X-Goog-Api-Key": GEMINI_API_KEY,
     }
+
+def gemini_model_url(model):
+    return f"{GEMINI_API_BASE}/models/{model}:generateContent"
+
+def admit_gemini(model, tokens=0, deadline=None):
+    """Admits one outbound Gemini request against `model`'s budget: a ticket, or None if it's turned away."""
+    return admission.admit(f"gemini:{model}", tokens, deadline)
+
+# Smoothed health per model: model -> {"latency_ms", "error_rate", "calls", "failed_at"}
+model_stats = {}
+model_stats_lock = threading.Lock()
+
+def record_model_result(model, ms, ok):
+    with model_stats_lock:
+        stats = model_stats.setdefault(model, {"latency_ms": None, "error_rate": 0.0, "calls": 0, "failed_at": 0})
+        stats["calls"] += 1
+        stats["error_rate"] += MODEL_EWMA_ALPHA * ((0.0 if ok else 1.0) - stats["error_rate"])
+        if ok:
+            previous = stats["latency_ms"]
+            stats["latency_ms"] = ms if previous is None else previous + MODEL_EWMA_ALPHA * (ms - previous)
+        else:
+            stats["failed_at"] = time.time()
+    record_metric("model_calls", f"{model}_{'ok' if ok else 'errors'}")
+    if ok:
+        record_metric("model_latency_ms", model, ms)
+
+def latency_fits(stats, budget_seconds):
+    """Whether a model's smoothed latency, with MODEL_LATENCY_HEADROOM, fits budget_seconds (unknown latency fits)."""
+    if budget_seconds is None or not stats.get("latency_ms"):
+        return True
+    return stats["latency_ms"] * MODEL_LATENCY_HEADROOM / 1000 <= budget_seconds
+
+def route_models(command, budget_seconds=None):
+    """
+    The command's model tiers in the order to try them: configured preference,
+    except that models that have mostly been failing lately, or whose smoothed
+    latency wouldn't fit in budget_seconds, move behind ones that would.
+    """
+    tiers = GEMINI_COMMAND_MODELS.get(command) or [GEMINI_MODEL, GEMINI_FAST_MODEL]
+    tiers = list(dict.fromkeys(tiers))
+    now = time.time()
+    with model_stats_lock:
+        stats = {model: dict(model_stats.get(model, {})) for model in tiers}
+
+    def penalty(model):
+        s = stats[model]
+        unhealthy = s.get("error_rate", 0) > MODEL_UNHEALTHY_ERROR_RATE and now - s.get("failed_at", 0) < MODEL_RECOVERY_SECONDS
+        return (unhealthy, not latency_fits(s, budget_seconds))
+
+    ordered = sorted(tiers, key=penalty)  # stable, so preference holds among equals
+    if ordered[0] == tiers[0]:
+        reason = "preferred"
+    else:
+        reason = "unhealthy" if penalty(tiers[0])[0] else "tight_deadline"
+        log_event(
+            logging.INFO, "model_rerouted", f"🔀 Routed {command} to {ordered[0]} ({reason})",
+            command=command, model=ordered[0], passed_over=tiers[0], budget_s=budget_seconds and round(budget_seconds, 1),
+        )
+    record_metric("model_routing", f"{command}:{ordered[0]}:{reason}")
+    return ordered
+
+def call_gemini_api(prompt, persona=None, deadline=None, models=None):
+    """
+    Returns (text or GEMINI_FAILURE, outcome of the last call_gemini_model).
+    persona: key into PERSONAS, sent inline as systemInstruction. (Gemini
+    context caching needs at least 4,096 input tokens on the 2.0 models; the
+    personas are ~200, so there is nothing worth caching.)
+    models: tiers to try in order (default: route_models(persona)). A 429,
+    5xx or timeout moves on to the next one, but only while that model's
+    smoothed latency still fits what's left of the deadline.
+    """
+    models = models or route_models(persona)
+    for i, model in enumerate(models):
+        text, outcome = call_gemini_model(model, prompt, persona, deadline)
+        if outcome != "retry" or i == len(models) - 1:
+            return text, outcome
+        if deadline is not None:
+            left = deadline.remaining() * STAGE_SHARES["gemini"]
+            with model_stats_lock:
+                stats = dict(model_stats.get(models[i + 1], {}))
+            if left < MODEL_FALLBACK_MIN_SECONDS or not latency_fits(stats, left):
+                record_metric("model_fallbacks_skipped", f"{model}->{models[i + 1]}")
+                log_event(
+                    logging.INFO, "model_fallback_skipped", f"⌛ {model} failed, no time left for {models[i + 1]}",
+                    model=model, left_s=round(left, 1),
+                )
+                return text, outcome
+        record_metric("model_fallbacks", f"{model}->{models[i + 1]}")
+        log_event(logging.WARNING, "model_fallback", f"🔀 {model} failed, falling back to {models[i + 1]}", model=model)
+    return GEMINI_FAILURE, "failed"
+
+def call_gemini_model(model, prompt, persona=None, deadline=None):
+    """
+    One generateContent call on `model`: (text or GEMINI_FAILURE, outcome).
+    outcome is "ok", "retry" (429, 5xx, timeout or admission rejection:
+    another model is worth trying), "failed" (not worth retrying) or
+    "cut_off" (our own deadline ran out, which says nothing about the model).
+    The request is admitted against `model`'s budget first; rejections and
+    cut-offs don't count against the model's health.
+    """
     body = {
         "contents": [
             {
@@ -238,21 +1479,192 @@ def call_gemini_api(prompt):
         ]
     }
 
-    response = requests.post(GEMINI_API_URL, headers=headers, json=body)
+    if persona:
+        body["systemInstruction"] = {"parts": [{"text": gemini_system_instruction(persona)}]}
+
+    if deadline is not None and deadline.remaining() < MIN_STAGE_SECONDS:
+        record_metric("deadline_expired", "gemini")
+        return GEMINI_FAILURE, "cut_off"
+
+    tokens = estimate_tokens(prompt) + GEMINI_OUTPUT_TOKEN_ESTIMATE
+    if persona:
+        tokens += estimate_tokens(gemini_system_instruction(persona))
+    ticket = admit_gemini(model, tokens, deadline)
+    if ticket is None:
+        record_metric("generation", f"{persona}_rejected")
+        return GEMINI_FAILURE, "retry"
+
+    limit = STAGE_TIMEOUTS["gemini"]
+    if deadline is not None:
+        limit = min(limit, max(MIN_STAGE_SECONDS, deadline.remaining() * STAGE_SHARES["gemini"]))
+    started = time.monotonic()
+    response = timed_request("POST", gemini_model_url(model), "gemini", deadline, headers=gemini_headers(), json=body)
+    elapsed_ms = (time.monotonic() - started) * 1000
+    if response is None:
+        # Timed out on a socket timeout the deadline shortened: our budget ran out, not the model
+        if limit < STAGE_TIMEOUTS["gemini"] and elapsed_ms >= limit * 950:
+            return GEMINI_FAILURE, "cut_off"
+        record_model_result(model, elapsed_ms, ok=False)
+        return GEMINI_FAILURE, "retry"
+    log_event(
+        logging.INFO, "gemini_call", "⏱️ Gemini call",
+        model=model, ms=round(elapsed_ms), prompt_tokens=estimate_tokens(prompt), status=response.status_code,
+    )
+
     if response.status_code != 200:
-        sys.stderr.write(f"⚠️ Gemini API error {response.status_code}: {response.text}\n")
-        return "[Failed to generate summary.]"
+        log_event(logging.ERROR, "gemini_error", "⚠️ Gemini API error", model=model, status=response.status_code, body=response.text[:500])
+        retryable = response.status_code == 429 or response.status_code >= 500
+        record_model_result(model, elapsed_ms, ok=not retryable)
+        return GEMINI_FAILURE, "retry" if retryable else "failed"
+    record_model_result(model, elapsed_ms, ok=True)
 
     try:
         data = response.json()
-        sys.stderr.write(f"Gemini API response JSON:\n{json.dumps(data, indent=2)}\n")
+        log_event(logging.DEBUG, "gemini_response", "Gemini API response", response=data)
         
+        usage = data.get("usageMetadata") or {}
+        total_tokens = usage.get("totalTokenCount") or usage.get("promptTokenCount", 0) + usage.get("candidatesTokenCount", 0)
+        if total_tokens:
+            admission.settle(ticket, total_tokens)
+
         # ✅ Correct way to extract the summary
-        return data["candidates"][0]["content"]["parts"][0]["text"]
+        return data["candidates"][0]["content"]["parts"][0]["text"], "ok"
 
     except Exception as e:
-        sys.stderr.write(f"⚠️ Failed to parse Gemini API response: {e}\n")
-        return "[Failed to generate summary.]"
+        log_event(logging.ERROR, "gemini_error", f"⚠️ Failed to parse Gemini API response: {e}")
+        return GEMINI_FAILURE, "failed"
+
+def ordinal(n):
+    if 10 <= n % 100 <= 20:
+        return f"{n}th"
+    suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+def describe_minute(minute):
+    if minute is None:
+        return "at some point"
+    if 40 <= minute <= 45:
+        return f"just before halftime ({ordinal(minute)} minute)"
+    if minute >= 85:
+        return f"late on, in the {ordinal(minute)} minute"
+    return f"in the {ordinal(minute)} minute"
+
+def render_recap_template(match_data, events, player_grades):
+    """Deterministic on-brand recap built straight from the parsed match, used when Gemini is slow or down."""
+    home, away = match_data["home_team"], match_data["away_team"]
+    lines = [f"🎙️ Taycan A. Schitt with your FSG highlights! {home} {match_data['home_score']}-{match_data['away_score']} {away}."]
+
+    for e in events:
+        if e["kind"] == "goal":
+            scorer = e["players"][0] if e["players"] else "somebody"
+            assist = f", set up by {e['players'][1]}" if "assist" in e["tags"] and len(e["players"]) > 1 else ""
+            score = f" to make it {e['score'][0]}-{e['score'][1]}" if e["score"] else ""
+            lines.append(f"⚽ {scorer} buried it {describe_minute(e['minute'])}{assist}{score}.")
+        elif "red_card" in e["tags"]:
+            who = e["players"][0] if e["players"] else "Somebody"
+            lines.append(f"🟥 {who} got sent off {describe_minute(e['minute'])}. Ain't no coming back from that.")
+        elif e["kind"] in ("disallowed", "penalty"):
+            lines.append(f"🧑‍⚖️ Ref {match_data.get('referee', 'N/A')} had a say {describe_minute(e['minute'])}: {e['text'].split(' - ', 1)[-1]}")
+
+    motm = match_data.get("motm_winner")
+    if motm and motm not in ("N/A", "Match drawn, no MoTM winner"):
+        graded = next((p for p in player_grades if p["name"] == motm and p["grade"]), None)
+        note = f" ({graded['position']}, {graded['grade']} 📊)" if graded else ""
+        lines.append(f"🏅 Man of the match: {motm}{note}.")
+    else:
+        rated = [p for p in player_grades if p["grade"]]
+        if rated:
+            best = max(rated, key=lambda p: p["grade"])
+            lines.append(f"🏅 Standout: {best['name']} ({best['position']}, {best['grade']} 📊) for {best['team']}.")
+
+    lines.append("That's the tape, y'all. Back to you in the studio.")
+    return "\n".join(lines)
+
+def render_preview_template(team1_standings, team2_standings, team1_last_match, team2_last_match):
+    """Deterministic preview from standings and last results, used when Gemini is slow or down."""
+    lines = [f"📺 FSG Preview: {team1_standings['team']} vs {team2_standings['team']}!"]
+
+    for standings, last_match in ((team1_standings, team1_last_match), (team2_standings, team2_last_match)):
+        line = (
+            f"{standings['team']} sit {ordinal(standings['place'])} on {standings['points']} pts "
+            f"({standings['wins']}-{standings['draws']}-{standings['losses']}, GD {standings['diff']:+d})."
+        )
+        if last_match:
+            md = last_match["match_data"]
+            line += f" Last time out: {md['home_team']} {md['home_score']}-{md['away_score']} {md['away_team']}."
+            rated = [p for p in last_match["player_grades"] if p["grade"]]
+            if rated:
+                best = max(rated, key=lambda p: p["grade"])
+                line += f" Watch {best['name']} ({best['position']}, {best['grade']} 📊)."
+        else:
+            line += " Coming off a bye."
+        lines.append(line)
+
+    gap = team1_standings["points"] - team2_standings["points"]
+    if abs(gap) <= 2:
+        lines.append("Prediction: too close to call. Grab the popcorn, this one's a coin flip.")
+    else:
+        favorite = team1_standings if gap > 0 else team2_standings
+        lines.append(f"Prediction: {favorite['team']} got the edge, {abs(gap)} points clear for a reason.")
+    return "\n".join(lines)
+
+gemini_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("GEMINI_WORKERS", 8)))
+
+def generate_with_fallback(command, prompt, render_fallback, deadline=None):
+    """
+    Asks Gemini for the command's text but only waits GENERATION_DEADLINES[command]
+    (or the Gemini share of what's left of the command deadline, if shorter),
+    including any time spent queued for admission (each model's requests are
+    admitted in call_gemini_model). On timeout, error or rejection by the
+    admission controller, returns render_fallback() instead.
+    The worker runs on a child deadline that ends at the cutoff, so its socket
+    timeouts and model fallbacks stop when the template goes out; a call cut
+    off that way counts as a timeout, not an error. Saved latency is how much
+    longer the answer was expected to take: the first model's smoothed latency
+    (or the Gemini stage timeout, if it has none yet) past the moment the
+    template went out.
+    """
+    wait = GENERATION_DEADLINES.get(command, 15)
+    if deadline is not None:
+        wait = min(wait, deadline.remaining() * STAGE_SHARES["gemini"])
+    record_metric("generation", f"{command}_requests")
+    started = time.monotonic()
+
+    if wait < MIN_STAGE_SECONDS:
+        # No time left to even ask; go straight to the template
+        record_metric("deadline_expired", "gemini")
+    else:
+        cutoff = started + wait
+        # copy_context carries the correlation id, sender and command (for admission) into the worker thread
+        context = contextvars.copy_context()
+        models = route_models(command, cutoff - time.monotonic())
+        future = gemini_executor.submit(
+            context.run, call_gemini_api, prompt, persona=command,
+            deadline=Deadline(cutoff - time.monotonic()), models=models,
+        )
+        try:
+            text, outcome = future.result(timeout=max(MIN_STAGE_SECONDS, cutoff - time.monotonic()))
+        except FutureTimeoutError:
+            text, outcome = GEMINI_FAILURE, "cut_off"
+        if outcome == "ok":
+            record_metric("generation", f"{command}_gemini_ms", (time.monotonic() - started) * 1000)
+            return text
+        if outcome == "cut_off":
+            record_metric("generation", f"{command}_timeouts")
+            with model_stats_lock:
+                expected_ms = model_stats.get(models[0], {}).get("latency_ms") or STAGE_TIMEOUTS["gemini"] * 1000
+            saved_ms = started * 1000 + expected_ms - time.monotonic() * 1000
+            if saved_ms > 0:
+                record_metric("generation", f"{command}_saved_ms", saved_ms)
+        else:
+            record_metric("generation", f"{command}_errors")
+
+    render_started = time.monotonic()
+    text = render_fallback()
+    record_metric("generation", f"{command}_fallbacks")
+    record_metric("generation", f"{command}_template_ms", (time.monotonic() - render_started) * 1000)
+    log_event(logging.INFO, "template_fallback", f"🪄 Posted template {command} instead of Gemini", command=command)
+    return text
 
 import re
 
@@ -289,170 +1701,209 @@ def parse_player_grades(soup, home_team_name, away_team_name):
                 "name": name_tag.text.strip(),
                 "grade": grade
             })
+
+    for team in (home_team_name, away_team_name):
+        name_index.add(team, "team")
+    for p in players:
+        name_index.add(p["name"], "player", team=p["team"], position=p["position"])
     return players
 
 import re
 
-def get_latest_game_ids_from_league(url):
-    from bs4 import BeautifulSoup
-    import re
+def get_latest_game_ids_from_league(url, deadline=None):
+    # Results are public: read them over the shared anonymous X11 pool
+    session = upstream_session("x11")
+    # The results table has no id; fingerprint just the rows that link a match
+    status, fragment, cached = fetch_x11_fragment(
+        session, url, "results", deadline=deadline, rows_with="gameDetails.aspx?GameID="
+    )
+    if cached is not None:
+        return cached
+    if fragment is None:
+        if status != 200:
+            log_event(logging.WARNING, "x11_fetch_failed", "⚠️ Failed to fetch league table", url=url, status=status)
+        return []  # a 200 without match rows: nothing played yet
+
+    soup = BeautifulSoup(fragment, "html.parser")
+    game_links = soup.select('a[href*="gameDetails.aspx?GameID="]')
+    
+    matches = []
+    for link in game_links:
+        game_id_match = re.search(r"GameID=(\d+)", link["href"])
+        if game_id_match:
+            game_id = game_id_match.group(1)
+            # Get the text content from the row that contains this link
+            row = link.find_parent("tr")
+            if not row:
+                continue
+            cells = row.find_all("td")
+            if len(cells) >= 3:
+                home = cells[1].text.strip()
+                away = cells[3].text.strip()
+                matches.append({
+                    "home_team": home,
+                    "away_team": away,
+                    "game_id": game_id
+                })
+
+    remember_parse("results", url, fragment, matches)
+    return matches
+
+# Finished matches never change, so their parse is kept (and persisted in the warm state)
+parsed_matches = {}  # game_id -> (match_data, player_grades, events)
+
+def load_match_details(session, game_id, deadline=None):
+    """Fetches and parses one match page: (match_data with MoTM fields, player_grades, events), or None."""
+    cached = parsed_matches.get(str(game_id))
+    if cached:
+        return cached
+
+    match_url = f"{X11_BASE_URL}/gameDetails.aspx?GameID={game_id}&dh=2"
+    match_html = scrape_match_html(session, match_url, deadline)
+    if not match_html:
+        return None
 
-    with requests.Session() as session:
-        page = session.get(url)
-        if page.status_code != 200:
-            sys.stderr.write(f"⚠️ Failed to fetch league table: {page.status_code}\n")
-            return []
+    soup = BeautifulSoup(match_html, "html.parser")
 
-        soup = BeautifulSoup(page.text, "html.parser")
-        game_links = soup.select('a[href*="gameDetails.aspx?GameID="]')
-        
-        matches = []
-        for link in game_links:
-            game_id_match = re.search(r"GameID=(\d+)", link["href"])
-            if game_id_match:
-                game_id = game_id_match.group(1)
-                # Get the text content from the row that contains this link
-                row = link.find_parent("tr")
-                if not row:
-                    continue
-                cells = row.find_all("td")
-                if len(cells) >= 3:
-                    home = cells[1].text.strip()
-                    away = cells[3].text.strip()
-                    matches.append({
-                        "home_team": home,
-                        "away_team": away,
-                        "game_id": game_id
-                    })
-
-        return matches
-
-def scrape_and_summarize_by_game_id(game_id):
-    login_url = "https://www.xperteleven.com/front_new3.aspx"
-    match_url = f"https://www.xperteleven.com/gameDetails.aspx?GameID={game_id}&dh=2"
-
-    with requests.Session() as session:
-        login_page = session.get(login_url)
-        login_soup = BeautifulSoup(login_page.text, "html.parser")
-        try:
-            viewstate = login_soup.find("input", {"id": "__VIEWSTATE"})["value"]
-            viewstategen = login_soup.find("input", {"id": "__VIEWSTATEGENERATOR"})["value"]
-            eventvalidation = login_soup.find("input", {"id": "__EVENTVALIDATION"})["value"]
-        except Exception:
-            sys.stderr.write("⚠️ Could not find login form hidden fields.\n")
-            return "[Login form fields missing.]"
-
-        login_payload = {
-            "__VIEWSTATE": viewstate,
-            "__VIEWSTATEGENERATOR": viewstategen,
-            "__EVENTVALIDATION": eventvalidation,
-            "ctl00$cphMain$FrontControl$lwLogin$tbUsername": X11_USERNAME,
-            "ctl00$cphMain$FrontControl$lwLogin$tbPassword": X11_PASSWORD,
-            "ctl00$cphMain$FrontControl$lwLogin$btnLogin": "Login"
-        }
-        login_response = session.post(login_url, data=login_payload)
-        if "Logout" not in login_response.text:
-            return "[Login to Xpert Eleven failed.]"
+    # FIXED: Parse match_data first before player grades
+    match_data = parse_match_data(soup)
+    player_grades = parse_player_grades(soup, match_data["home_team"], match_data["away_team"])
+    events = parse_match_events(soup, [p["name"] for p in player_grades])
 
-        match_html = scrape_match_html(session, match_url)
-        if not match_html:
-            return "[Failed to retrieve match page.]"
+    motm_home = soup.find(id="ctl00_cphMain_hplBestHome")
+    motm_away = soup.find(id="ctl00_cphMain_hplBestAway")
+    match_data["motm_home"] = motm_home.text.strip() if motm_home else "N/A"
+    match_data["motm_away"] = motm_away.text.strip() if motm_away else "N/A"
 
-        soup = BeautifulSoup(match_html, "html.parser")
-        
-        # FIXED: Parse match_data first before player grades
-        match_data = parse_match_data(soup)
-        player_grades = parse_player_grades(soup, match_data["home_team"], match_data["away_team"])
-        events = parse_match_events(soup)
-
-        motm_home = soup.find(id="ctl00_cphMain_hplBestHome")
-        motm_away = soup.find(id="ctl00_cphMain_hplBestAway")
-        match_data["motm_home"] = motm_home.text.strip() if motm_home else "N/A"
-        match_data["motm_away"] = motm_away.text.strip() if motm_away else "N/A"
-
-        if match_data["home_score"].isdigit() and match_data["away_score"].isdigit():
-            if int(match_data["home_score"]) > int(match_data["away_score"]):
-                match_data["motm_winner"] = match_data["motm_home"]
-            elif int(match_data["away_score"]) > int(match_data["home_score"]):
-                match_data["motm_winner"] = match_data["motm_away"]
-            else:
-                match_data["motm_winner"] = "Match drawn, no MoTM winner"
+    if match_data["home_score"].isdigit() and match_data["away_score"].isdigit():
+        if int(match_data["home_score"]) > int(match_data["away_score"]):
+            match_data["motm_winner"] = match_data["motm_home"]
+        elif int(match_data["away_score"]) > int(match_data["home_score"]):
+            match_data["motm_winner"] = match_data["motm_away"]
         else:
-            match_data["motm_winner"] = "N/A"
-
-        prompt = format_gemini_prompt(match_data, events, player_grades)
-        return call_gemini_api(prompt)
+            match_data["motm_winner"] = "Match drawn, no MoTM winner"
+    else:
+        match_data["motm_winner"] = "N/A"
+
+    store_snapshot("match", str(game_id), {
+        "match": match_data,
+        "events": events,
+        "players": player_grades,
+    })
+    if match_data["home_score"].isdigit() and match_data["away_score"].isdigit():
+        parsed_matches[str(game_id)] = (match_data, player_grades, events)
+    return match_data, player_grades, events
+
+def scrape_and_summarize_by_game_id(game_id, deadline=None):
+    session = get_logged_in_session(deadline)
+    if not session:
+        return "[Login to Xpert Eleven failed.]"
 
-def get_match_summary_and_grades(game_id):
-    login_url = "https://www.xperteleven.com/front_new3.aspx"
-    match_url = f"https://www.xperteleven.com/gameDetails.aspx?GameID={game_id}&dh=2"
+    details = load_match_details(session, game_id, deadline)
+    if not details:
+        return "[Failed to retrieve match page.]"
+    match_data, player_grades, events = details
 
-    with requests.Session() as session:
-        login_page = session.get(login_url)
-        login_soup = BeautifulSoup(login_page.text, "html.parser")
-        try:
-            viewstate = login_soup.find("input", {"id": "__VIEWSTATE"})["value"]
-            viewstategen = login_soup.find("input", {"id": "__VIEWSTATEGENERATOR"})["value"]
-            eventvalidation = login_soup.find("input", {"id": "__EVENTVALIDATION"})["value"]
-        except Exception:
-            sys.stderr.write("⚠️ Could not find login form hidden fields.\n")
-            return "[Login form fields missing.]", []
-
-        login_payload = {
-            "__VIEWSTATE": viewstate,
-            "__VIEWSTATEGENERATOR": viewstategen,
-            "__EVENTVALIDATION": eventvalidation,
-            "ctl00$cphMain$FrontControl$lwLogin$tbUsername": X11_USERNAME,
-            "ctl00$cphMain$FrontControl$lwLogin$tbPassword": X11_PASSWORD,
-            "ctl00$cphMain$FrontControl$lwLogin$btnLogin": "Login"
-        }
+    prompt = format_gemini_prompt(match_data, events, player_grades)
+    return generate_with_fallback(
+        "recap", prompt, lambda: render_recap_template(match_data, events, player_grades), deadline
+    )
 
-        login_response = session.post(login_url, data=login_payload)
-        if "Logout" not in login_response.text:
-            return "[Login failed.]", []
+def get_match_summary_and_grades(game_id, summarize=True, deadline=None):
+    """
+    Returns (summary, player_grades, match_data); match_data is None on failure.
+    summarize=False skips the Gemini recap when only grades and match data are needed.
+    """
+    session = get_logged_in_session(deadline)
+    if not session:
+        return "[Login failed.]", [], None
 
-        match_html = scrape_match_html(session, match_url)
-        if not match_html:
-            return "[Failed to retrieve match page.]", []
+    details = load_match_details(session, game_id, deadline)
+    if not details:
+        return "[Failed to retrieve match page.]", [], None
+    match_data, player_grades, events = details
 
-        soup = BeautifulSoup(match_html, "html.parser")
+    if not summarize:
+        return None, player_grades, match_data
 
-        # FIXED: Parse match_data before player_grades
-        match_data = parse_match_data(soup)
-        player_grades = parse_player_grades(soup, match_data["home_team"], match_data["away_team"])
-        events = parse_match_events(soup)
+    prompt = format_gemini_prompt(match_data, events, player_grades)
+    summary = generate_with_fallback(
+        "recap", prompt, lambda: render_recap_template(match_data, events, player_grades), deadline
+    )
+    return summary, player_grades, match_data
 
-        motm_home = soup.find(id="ctl00_cphMain_hplBestHome")
-        motm_away = soup.find(id="ctl00_cphMain_hplBestAway")
-        match_data["motm_home"] = motm_home.text.strip() if motm_home else "N/A"
-        match_data["motm_away"] = motm_away.text.strip() if motm_away else "N/A"
+# Matches of a full-round recap fetched and generated at once (shared by all such commands)
+ROUND_RECAP_CONCURRENCY = int(os.environ.get("ROUND_RECAP_CONCURRENCY", 4))
+round_recap_executor = ThreadPoolExecutor(max_workers=ROUND_RECAP_CONCURRENCY)
 
-        if match_data["home_score"].isdigit() and match_data["away_score"].isdigit():
-            if int(match_data["home_score"]) > int(match_data["away_score"]):
-                match_data["motm_winner"] = match_data["motm_home"]
-            elif int(match_data["away_score"]) > int(match_data["home_score"]):
-                match_data["motm_winner"] = match_data["motm_away"]
-            else:
-                match_data["motm_winner"] = "Match drawn, no MoTM winner"
-        else:
-            match_data["motm_winner"] = "N/A"
+def recap_round_match(session, game_id, deadline=None):
+    """One match of a full-round recap: its score line and Gemini (or template) recap, or None."""
+    if deadline is not None and deadline.expired():
+        # Queued past the command's deadline: nobody is waiting for this one
+        return None
+    details = load_match_details(session, game_id, deadline)
+    if not details:
+        log_event(logging.WARNING, "x11_fetch_failed", f"⚠️ Failed to retrieve match page for game {game_id}")
+        return None
+    match_data, player_grades, events = details
+    prompt = format_gemini_prompt(match_data, events, player_grades)
+    summary = generate_with_fallback(
+        "recap", prompt, lambda: render_recap_template(match_data, events, player_grades), deadline
+    )
+    score_line = f"{match_data['home_team']} {match_data['home_score']}-{match_data['away_score']} {match_data['away_team']}"
+    return f"⚽ {score_line}\n\n{summary}"
 
-        prompt = format_gemini_prompt(match_data, events, player_grades)
-        summary = call_gemini_api(prompt)
-        return summary, player_grades, match_data
+def generate_round_recaps(league, deadline=None):
+    """
+    Recaps of every match in the league's latest round from one login and one
+    league crawl. Matches are fetched and generated concurrently (at most
+    ROUND_RECAP_CONCURRENCY at a time), so the round takes about as long as
+    its slowest match. Yields recaps in fixture order as soon as each (and
+    every one before it) is ready; yields nothing if login or the crawl fails.
+    Once the deadline passes (or the caller stops reading), matches that
+    haven't started are cancelled so they spend no X11 or Gemini budget.
+    """
+    session = get_logged_in_session(deadline)
+    if not session:
+        return
+    matches = get_latest_game_ids_from_league(league["url"], deadline)
+    started = time.monotonic()
+    # copy_context carries the correlation id, sender and command (for admission) into the workers
+    futures = [
+        round_recap_executor.submit(contextvars.copy_context().run, recap_round_match, session, match["game_id"], deadline)
+        for match in matches
+    ]
+    try:
+        for match, future in zip(matches, futures):
+            try:
+                recap = future.result(timeout=max(0, deadline.remaining()) if deadline is not None else None)
+            except FutureTimeoutError:
+                record_metric("deadline_expired", "round_recap")
+                log_event(logging.WARNING, "round_recap_timeout", f"⌛ No recap for game {match['game_id']} before the deadline")
+                continue
+            if recap:
+                yield recap
+    finally:
+        cancelled = sum(future.cancel() for future in futures)
+        if cancelled:
+            record_metric("generation", "round_recap_cancelled", cancelled)
+    record_metric("generation", "round_recap_matches", len(matches))
+    record_metric("generation", "round_recap_ms", (time.monotonic() - started) * 1000)
 
 import sys  # Make sure this is imported at the top
 
-def scrape_league_standings_with_login(session, league_url):
-    response = session.get(league_url)
-    if response.status_code != 200:
-        sys.stderr.write(f"⚠️ Failed to fetch league table with login: {response.status_code}\n")
+def scrape_league_standings_with_login(session, league_url, deadline=None):
+    status, fragment, cached = fetch_x11_fragment(session, league_url, "standings", "ctl00_cphMain_dgStandings", deadline)
+    if cached is not None:
+        return cached
+    if status != 200:
+        log_event(logging.WARNING, "x11_fetch_failed", "⚠️ Failed to fetch league table with login", url=league_url, status=status)
         return []
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    standings_table = soup.find("table", id="ctl00_cphMain_dgStandings")
+    standings_table = BeautifulSoup(fragment, "html.parser").table if fragment else None
     if not standings_table:
-        sys.stderr.write("⚠️ Standings table not found in logged-in page.\n")
+        log_event(logging.WARNING, "standings_missing", "⚠️ Standings table not found in logged-in page.", url=league_url)
+        invalidate_x11_session()
         return []
 
     rows = standings_table.find_all("tr")[1:]  # Skip header row
@@ -461,8 +1912,8 @@ def scrape_league_standings_with_login(session, league_url):
         cols = row.find_all("td")
         if len(cols) < 12:  # adjust if your table has 12+ columns
             continue
-        # Debug print all columns for this row
-        sys.stderr.write(f"STANDINGS ROW COLS: {[col.text.strip() for col in cols]}\n")
+        if log.isEnabledFor(logging.DEBUG):
+            log_event(logging.DEBUG, "standings_row", "Standings row", cols=[col.text.strip() for col in cols])
         try:
             place = int(cols[0].text.strip().strip("."))
             team_link = cols[2].find("a")
@@ -493,12 +1944,15 @@ def scrape_league_standings_with_login(session, league_url):
             })
 
         except Exception as e:
-            sys.stderr.write(f"⚠️ Error parsing standings row: {e}\n")
+            log_event(logging.WARNING, "standings_row_failed", f"⚠️ Error parsing standings row: {e}")
             continue
 
+    if standings:
+        store_snapshot("standings", league_key_for_url(league_url), standings)
+        remember_parse("standings", league_url, fragment, standings)
     return standings
 
-def generate_standings_summary(standings, league_name):
+def generate_standings_summary(standings, league):
     if not standings:
         return "Standings data is missing."
 
@@ -519,11 +1973,8 @@ def generate_standings_summary(standings, league_name):
     if hunt_pack:
         summary += f"⚔️ In the Hunt: {', '.join(hunt_pack)}\n"
 
-    # 📉 Relegation / 🪨 Rock Bottom Watch
-    if "goondesliga" in league_name.lower():
-        bottom_watch_label = "📉 Relegation watch"
-    else:
-        bottom_watch_label = "🪨 Rock Bottom Watch"
+    # 📉 Relegation / 🪨 Rock Bottom Watch (per league, from the registry)
+    bottom_watch_label = league["relegation_label"]
     relegation = []
     if len(standings) >= 6:
         sixth_place_points = standings[5]["points"]
@@ -535,14 +1986,18 @@ def generate_standings_summary(standings, league_name):
 
     return summary.strip()
 
-def scrape_upcoming_fixtures_from_standings_page(session, url):
+def scrape_upcoming_fixtures_from_standings_page(session, url, deadline=None):
     """Scrapes upcoming fixtures from the same page as standings."""
-    response = session.get(url)
-    if response.status_code != 200:
-        sys.stderr.write(f"⚠️ Failed to fetch standings + fixtures page: {response.status_code}\n")
+    status, fragment, cached = fetch_x11_fragment(session, url, "fixtures", "ctl00_cphMain_dgUpcoming", deadline)
+    if cached is not None:
+        return cached
+    if status != 200:
+        log_event(logging.WARNING, "x11_fetch_failed", "⚠️ Failed to fetch standings + fixtures page", url=url, status=status)
+        return []
+    if fragment is None:
         return []
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(fragment, "html.parser")
     fixtures = []
     rows = soup.select("#ctl00_cphMain_dgUpcoming tr")
     for row in rows:
@@ -560,27 +2015,45 @@ def scrape_upcoming_fixtures_from_standings_page(session, url):
                 "away_team": away,
                 "game_id": game_id
             })
+    store_snapshot("fixtures", league_key_for_url(url), fixtures)
+    remember_parse("fixtures", url, fragment, fixtures)
     return fixtures
 
-def generate_tv_schedule_from_upcoming(goon_fixtures, spoon_fixtures, goon_standings, spoon_standings):
+def crawl_leagues(session, deadline=None):
+    """Standings and upcoming fixtures for every registry league: key -> {"standings", "fixtures"}."""
+    return {
+        key: {
+            "standings": scrape_league_standings_with_login(session, league["url"], deadline),
+            "fixtures": scrape_upcoming_fixtures_from_standings_page(session, league["url"], deadline),
+        }
+        for key, league in LEAGUES.items()
+    }
+
+def all_standings(crawl):
+    return [entry for league in crawl.values() for entry in league["standings"]]
+
+def generate_tv_schedule_from_upcoming(crawl):
+    """crawl: crawl_leagues() output. The marquee matchup comes from the first (top-flight) league."""
     channels = ["FSG", "FSG2", "FSG3", "FSG+", "FSG Radio 📻", "FSG Kids 🧸"]
-    points_map = {normalize(team["team"]): team["points"] for team in goon_standings + spoon_standings}
+    points_map = {normalize(team["team"]): team["points"] for team in all_standings(crawl)}
     all_matches = []
-    for match in goon_fixtures + spoon_fixtures:
-        home = normalize(match["home_team"])
-        away = normalize(match["away_team"])
-        home_points = points_map.get(home, 0)
-        away_points = points_map.get(away, 0)
-        combined = home_points + away_points
-        all_matches.append({
-            "match": f"{match['home_team']} vs {match['away_team']}",
-            "combined_points": combined,
-            "division": "Goondesliga" if match in goon_fixtures else "Spoondesliga"
-        })
+    for key, league in crawl.items():
+        for match in league["fixtures"]:
+            home = normalize(match["home_team"])
+            away = normalize(match["away_team"])
+            home_points = points_map.get(home, 0)
+            away_points = points_map.get(away, 0)
+            combined = home_points + away_points
+            all_matches.append({
+                "match": f"{match['home_team']} vs {match['away_team']}",
+                "combined_points": combined,
+                "division": key
+            })
     sorted_matches = sorted(all_matches, key=lambda x: -x["combined_points"])
     if not sorted_matches:
         return "⚠️ No upcoming matches found."
-    marquee = next((m for m in sorted_matches if m["division"] == "Goondesliga"), None)
+    top_flight = next(iter(LEAGUES), None)
+    marquee = next((m for m in sorted_matches if m["division"] == top_flight), None)
     
     output = ["📺 FoxSportsGoon TV Kzhedule ⚽\n"]
     if marquee:
@@ -599,17 +2072,16 @@ def generate_tv_schedule_from_upcoming(goon_fixtures, spoon_fixtures, goon_stand
         i += 1
     return "\n".join(output)
 
-def get_last_match_for_team(team_name, league_urls):
+def get_last_match_for_team(team_name, league_urls, deadline=None):
     """
     Given a normalized team_name and list of league URLs,
     returns the most recent match dict with keys home_team, away_team, game_id.
     """
-    normalized_team = normalize(team_name)
     for league_url in league_urls:
-        matches = get_latest_game_ids_from_league(league_url)
+        matches = get_latest_game_ids_from_league(league_url, deadline)
         # Find matches where this team was involved, assume matches are sorted most recent first
         for match in matches:
-            if normalize(match["home_team"]) == normalized_team or normalize(match["away_team"]) == normalized_team:
+            if same_team(match["home_team"], team_name) or same_team(match["away_team"], team_name):
                 return match
     return None
 
@@ -620,81 +2092,57 @@ def find_team_standing(team_name, standings):
     if not official_name:
         official_name = team_name  # fallback to original if no alias mapping
     
-    normalized_official = normalize(official_name)
-    
     for entry in standings:
-        if normalize(entry["team"]) == normalized_official:
+        if same_team(entry["team"], official_name):
             return entry
     return None
 
 def format_gemini_match_preview_prompt(team1_standings, team2_standings, team1_last_match, team2_last_match):
-    prompt = (
-        f"You are Taycan A. Schitt, a studio TV analyst for FoxSportsGoon. You provide exciting, insightful **match previews** for upcoming soccer games.\n\n"
-        f"Talk in a slight African American accent.\n"
-        f"ALWAYS keep your previews between 990-1000 characters. NEVER go above 1000.\n"
-        f"Use the current league standings (place, wins, draws, losses, goals for, goals against, goal difference, and points) as context for your analysis.\n"
-        f"Include recent form based on the last match result and key player performances.\n"
-        f"Make predictions and build excitement for the upcoming game.\n"
-        f"Use full player names and their performance rating in the format (position, grade 📊) the first time they are mentioned when relevant.\n.\n"
-        f"Keep it engaging as a TV preview.\n\n"
-        f"If a team has no recent match, they had a bye round, just use standings in your analysis for them.\n\n"
-    )
-
-    # Team 1 info
-    prompt += (
-        f"Team 1: {team1_standings['team']}\n"
-        f"Place: {team1_standings['place']}, W-D-L: {team1_standings['wins']}-{team1_standings['draws']}-{team1_standings['losses']}, "
-        f"GF-GA-Diff: {team1_standings['gf']}-{team1_standings['ga']}-{team1_standings['diff']}, Points: {team1_standings['points']}\n"
-    )
-    if team1_last_match:
-        prompt += (
-            f"Last match result: {team1_last_match['match_data']['home_team']} "
-            f"{team1_last_match['match_data']['home_score']}-{team1_last_match['match_data']['away_score']} "
-            f"{team1_last_match['match_data']['away_team']}\n"
-            f"Key players and ratings:\n"
-        )
-        for p in team1_last_match['player_grades']:
-            prompt += f"- {p['name']} ({p['position']}, {p['grade']} 📊)\n"
-
-    # Team 2 info
-    prompt += (
-        f"\nTeam 2: {team2_standings['team']}\n"
-        f"Place: {team2_standings['place']}, W-D-L: {team2_standings['wins']}-{team2_standings['draws']}-{team2_standings['losses']}, "
-        f"GF-GA-Diff: {team2_standings['gf']}-{team2_standings['ga']}-{team2_standings['diff']}, Points: {team2_standings['points']}\n"
-    )
-    if team2_last_match:
-        prompt += (
-            f"Last match result: {team2_last_match['match_data']['home_team']} "
-            f"{team2_last_match['match_data']['home_score']}-{team2_last_match['match_data']['away_score']} "
-            f"{team2_last_match['match_data']['away_team']}\n"
-            f"Key players and ratings:\n"
-        )
-        for p in team2_last_match['player_grades']:
-            prompt += f"- {p['name']} ({p['position']}, {p['grade']} 📊)\n"
-
-    prompt += "\nGenerate a lively and insightful match preview considering the above.\n"
-    return prompt.strip()
+    lines = profile_lines((team1_standings["team"], team2_standings["team"]))
+    for label, standings, last_match in (
+        ("Team 1", team1_standings, team1_last_match),
+        ("Team 2", team2_standings, team2_last_match),
+    ):
+        lines.append((None,
+            f"\n{label}: {standings['team']}\n"
+            f"Place: {standings['place']}, W-D-L: {standings['wins']}-{standings['draws']}-{standings['losses']}, "
+            f"GF-GA-Diff: {standings['gf']}-{standings['ga']}-{standings['diff']}, Points: {standings['points']}"
+        ))
+        if last_match:
+            lines.append((None,
+                f"Last match result: {last_match['match_data']['home_team']} "
+                f"{last_match['match_data']['home_score']}-{last_match['match_data']['away_score']} "
+                f"{last_match['match_data']['away_team']}\n"
+                f"Key players and ratings:"
+            ))
+            lines += [
+                (player_rank(p), f"- {p['name']} ({p['position']}, {p['grade']} 📊)")
+                for p in last_match['player_grades']
+            ]
+
+    lines.append((None, "\nGenerate a lively and insightful match preview considering the above."))
+    return build_budgeted_prompt("preview", lines).strip()
 
 def filter_players_for_team(player_grades, team_name):
     return [p for p in player_grades if p['team'] == team_name]
 
-def generate_match_preview(session, upcoming_match, goon_standings, spoon_standings):
+def generate_match_preview(session, upcoming_match, standings, deadline=None):
     """
     session: logged-in requests.Session()
     upcoming_match: dict with home_team, away_team, game_id
-    goon_standings/spoon_standings: lists of dicts from standings scraping
+    standings: standings rows of every league (all_standings of a crawl)
+    deadline: the command's Deadline, shared by every call made here
     """
 
-    # Find standings for each team in either league
-    all_standings = goon_standings + spoon_standings
-    home_standings = find_team_standing(upcoming_match["home_team"], all_standings)
-    away_standings = find_team_standing(upcoming_match["away_team"], all_standings)
-
-    league_urls = [GOONDESLIGA_URL, SPOONDESLIGA_URL]
+    # Find standings for each team in any league
+    home_standings = find_team_standing(upcoming_match["home_team"], standings)
+    away_standings = find_team_standing(upcoming_match["away_team"], standings)
+    if not home_standings or not away_standings:
+        return "Sorry, couldn't pull up the standings for that matchup right now."
 
     # Get last match for each team
-    home_last_match = get_last_match_for_team(upcoming_match["home_team"], league_urls)
-    away_last_match = get_last_match_for_team(upcoming_match["away_team"], league_urls)
+    home_last_match = get_last_match_for_team(upcoming_match["home_team"], league_urls(), deadline)
+    away_last_match = get_last_match_for_team(upcoming_match["away_team"], league_urls(), deadline)
 
     # If neither team has a last match, abort
     if not home_last_match and not away_last_match:
@@ -705,32 +2153,40 @@ def generate_match_preview(session, upcoming_match, goon_standings, spoon_standi
 
     # Get last match details for home team
     if home_last_match:
-        summary_home, player_grades_home_all, match_data_home = get_match_summary_and_grades(home_last_match["game_id"])
-        team1_name = home_standings['team']
-        team1_player_grades = filter_players_for_team(player_grades_home_all, team1_name)
-        team1_last_match = {
-            "match_data": match_data_home,
-            "player_grades": team1_player_grades
-        }
+        summary_home, player_grades_home_all, match_data_home = get_match_summary_and_grades(
+            home_last_match["game_id"], summarize=False, deadline=deadline
+        )
+        if match_data_home:
+            team1_name = home_standings['team']
+            team1_player_grades = filter_players_for_team(player_grades_home_all, team1_name)
+            team1_last_match = {
+                "match_data": match_data_home,
+                "player_grades": team1_player_grades
+            }
 
     # Get last match details for away team
     if away_last_match:
-        summary_away, player_grades_away_all, match_data_away = get_match_summary_and_grades(away_last_match["game_id"])
-        team2_name = away_standings['team']
-        team2_player_grades = filter_players_for_team(player_grades_away_all, team2_name)
-        team2_last_match = {
-            "match_data": match_data_away,
-            "player_grades": team2_player_grades
-        }
+        summary_away, player_grades_away_all, match_data_away = get_match_summary_and_grades(
+            away_last_match["game_id"], summarize=False, deadline=deadline
+        )
+        if match_data_away:
+            team2_name = away_standings['team']
+            team2_player_grades = filter_players_for_team(player_grades_away_all, team2_name)
+            team2_last_match = {
+                "match_data": match_data_away,
+                "player_grades": team2_player_grades
+            }
 
     # Format prompt — this function must be okay with one or both last_match dicts being None
     prompt = format_gemini_match_preview_prompt(home_standings, away_standings, team1_last_match, team2_last_match)
 
-    # Call Gemini
-    preview_text = call_gemini_api(prompt)
+    # Call Gemini, falling back to the local template if it's slow or down
+    preview_text = generate_with_fallback("preview", prompt, lambda: render_preview_template(
+        home_standings, away_standings, team1_last_match, team2_last_match
+    ), deadline)
     return preview_text
 
-def scrape_league_stat_category(session, league_id, lnr, category, top_n=5):
+def scrape_league_stat_category(session, league_id, lnr, category, top_n=5, deadline=None):
     sel_map = {
         "goals": "S",
         "assists": "A",
@@ -742,20 +2198,36 @@ def scrape_league_stat_category(session, league_id, lnr, category, top_n=5):
     if not sel:
         return []
     
-    url = f"https://www.xperteleven.com/stats.aspx?Lid={league_id}&Sel={sel}&Lnr={lnr}&Period=S&dh=2"
-    response = session.get(url)
-    if response.status_code != 200:
-        sys.stderr.write(f"⚠️ Failed to fetch {category} stats: {response.status_code}\n")
+    url = f"{X11_BASE_URL}/stats.aspx?Lid={league_id}&Sel={sel}&Lnr={lnr}&Period=S&dh=2"
+    status, fragment, players_sorted = fetch_x11_fragment(session, url, "stats", "ctl00_cphMain_dgStats", deadline)
+    if players_sorted is None:
+        players_sorted = parse_stats_fragment(url, status, fragment, category, lnr)
+    if players_sorted is None:
         return []
-    
-    sys.stderr.write(f"DEBUG: URL fetched: {url}\n")
-    sys.stderr.write(f"DEBUG: Page snippet:\n{response.text[:1000]}\n")  # print first 1000 chars
-    
-    soup = BeautifulSoup(response.text, "html.parser")
-    table = soup.find("table", id="ctl00_cphMain_dgStats")
+
+    league_key = next((l["key"] for l in LEAGUES.values() if (l["league_id"], l["lnr"]) == (league_id, lnr)), f"{league_id}-{lnr}")
+    store_snapshot("leaders", f"{league_key}/{category}", players_sorted)
+
+    top_players = []
+    for p in players_sorted[:top_n]:
+        top_players.append(f"{p['player']}, {p['position']}, {p['team']} - {p['value_text']}")
+
+    return top_players
+
+def parse_stats_fragment(url, status, fragment, category, lnr):
+    """Stats rows from a dgStats table, sorted by value (desc); None when the page or table is missing."""
+    if status != 200:
+        log_event(logging.WARNING, "x11_fetch_failed", f"⚠️ Failed to fetch {category} stats", url=url, status=status)
+        return None
+
+    if log.isEnabledFor(logging.DEBUG):
+        log_event(logging.DEBUG, "stats_page", "Stats page fetched", url=url, snippet=(fragment or "")[:1000])
+
+    table = BeautifulSoup(fragment, "html.parser").table if fragment else None
     if not table:
-        sys.stderr.write(f"⚠️ Could not find stats table for category: {category} at Lnr={lnr}\n")
-        return []
+        log_event(logging.WARNING, "stats_missing", f"⚠️ Could not find stats table for category: {category} at Lnr={lnr}")
+        invalidate_x11_session()
+        return None
 
     rows = table.find_all("tr")
     players = []
@@ -781,45 +2253,218 @@ def scrape_league_stat_category(session, league_id, lnr, category, top_n=5):
             "value_text": value_text,
             "value_num": value_num
         })
-    
-        players_sorted = sorted(players, key=lambda x: x["value_num"], reverse=True)
-        top_players = []
-
-    for p in players_sorted[:top_n]:
-        top_players.append(f"{p['player']}, {p['position']}, {p['team']} - {p['value_text']}")
 
-    return top_players
+    players_sorted = sorted(players, key=lambda x: x["value_num"], reverse=True)
+    remember_parse("stats", url, fragment, players_sorted)
+    return players_sorted
+
+@app.before_request
+def start_request_context():
+    payload = request.get_json(silent=True) if request.method == "POST" else None
+    payload = payload if isinstance(payload, dict) else {}
+    request.context_tokens = [
+        (correlation_id, correlation_id.set(str(payload.get("id") or uuid.uuid4().hex[:12]))),
+        (request_sender, request_sender.set(str(payload.get("sender_id") or "-"))),
+        (request_command, request_command.set("-")),
+        (request_group, request_group.set(payload.get("group_id"))),
+    ]
+
+@app.teardown_request
+def end_request_context(exc):
+    for var, token in reversed(getattr(request, "context_tokens", [])):
+        var.reset(token)
 
 @app.route("/tv", methods=["POST"])
 def manual_tv_schedule():
-    session = get_logged_in_session()
+    deadline = Deadline(WEBHOOK_DEADLINE_SECONDS)
+    session = get_logged_in_session(deadline)
     if not session:
-        send_groupme_message("⚠️ Couldn't log in to X11")
+        send_groupme_message("⚠️ Couldn't log in to X11", deadline)
         return "ok", 200
 
-    goon_standings = scrape_league_standings_with_login(session, GOONDESLIGA_URL)
-    spoon_standings = scrape_league_standings_with_login(session, SPOONDESLIGA_URL)
-    goon_fixtures = scrape_upcoming_fixtures_from_standings_page(session, GOONDESLIGA_URL)
-    spoon_fixtures = scrape_upcoming_fixtures_from_standings_page(session, SPOONDESLIGA_URL)
-
-    tv_schedule = generate_tv_schedule_from_upcoming(
-        goon_fixtures, spoon_fixtures,
-        goon_standings, spoon_standings
-    )
+    tv_schedule = generate_tv_schedule_from_upcoming(crawl_leagues(session, deadline))
 
-    send_groupme_message(tv_schedule)
+    send_groupme_message(tv_schedule, deadline)
     return "ok", 200
 
 @app.route("/", methods=["GET"])
 def index():
     return "Taycan A. Schitt is alive!"
 
+@app.route("/metrics", methods=["GET"])
+def metrics_snapshot():
+    with metrics_lock:
+        snapshot = {group: dict(values) for group, values in metrics.items()}
+    snapshot["admission_usage"] = admission.usage()
+    snapshot["transport_summary"] = transport_summary()
+    with model_stats_lock:
+        snapshot["model_health"] = {model: dict(stats) for model, stats in model_stats.items()}
+    return jsonify(snapshot)
+
+def save_warm_state(path=None):
+    """Writes session cookies, API snapshots, parsed matches, the alias index and the fuzzy name index to WARM_STATE_PATH."""
+    path = path or WARM_STATE_PATH
+    if not path:
+        return False
+
+    with x11_session_lock:
+        session = x11_session_cache["session"]
+        cookies = session.cookies.get_dict() if session is not None else x11_session_cache["cookies"]
+        logged_in_at = x11_session_cache["logged_in_at"]
+    with snapshots_lock:
+        saved_snapshots = [
+            {"kind": kind, "key": key, "etag": s["etag"], "body": s["body"].decode("utf-8"), "updated_at": s["updated_at"]}
+            for (kind, key), s in snapshots.items()
+        ]
+
+    state = {
+        "version": WARM_STATE_VERSION,
+        "saved_at": time.time(),
+        "x11_cookies": cookies,
+        "x11_logged_in_at": logged_in_at,
+        "snapshots": saved_snapshots,
+        "parsed_matches": {game_id: list(details) for game_id, details in list(parsed_matches.items())},
+        "profiles_mtime": profiles_mtime,
+        "team_mapping": team_mapping,
+        "names": {kind: name_index.export(kind) for kind in ("team", "player")},
+    }
+    tmp_path = f"{path}.tmp"
+    try:
+        # Holds the X11 login cookies, so only this user may read it
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log_event(logging.WARNING, "warm_state_failed", f"⚠️ Could not save warm state: {e}")
+        return False
+    log_event(logging.INFO, "warm_state_saved", "💾 Saved warm state", path=path, snapshots=len(saved_snapshots), matches=len(parsed_matches))
+    return True
+
+def load_warm_state(path=None):
+    """Restores what save_warm_state wrote. Anything stale (expired session, changed profiles) is skipped."""
+    global team_mapping
+    path = path or WARM_STATE_PATH
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        log_event(logging.WARNING, "warm_state_failed", f"⚠️ Could not load warm state: {e}")
+        return False
+    if state.get("version") != WARM_STATE_VERSION:
+        return False
+
+    cookies = state.get("x11_cookies")
+    logged_in_at = state.get("x11_logged_in_at", 0)
+    if cookies and time.time() - logged_in_at < X11_SESSION_TTL_SECONDS:
+        # Turned into a requests.Session on first use, so boot doesn't import requests
+        with x11_session_lock:
+            x11_session_cache["cookies"] = cookies
+            x11_session_cache["logged_in_at"] = logged_in_at
+
+    with snapshots_lock:
+        for s in state.get("snapshots", []):
+            body = s["body"].encode("utf-8")
+            snapshots[(s["kind"], s["key"])] = {
+                "etag": s["etag"],
+                "body": body,
+                "gzip_body": gzip.compress(body, compresslevel=6),
+                "updated_at": s["updated_at"],
+            }
+
+    for game_id, details in state.get("parsed_matches", {}).items():
+        parsed_matches[game_id] = tuple(details)
+
+    if state.get("profiles_mtime") == profiles_mtime and state.get("team_mapping"):
+        team_mapping = state["team_mapping"]
+        index_profile_teams(team_mapping)
+    for kind, entries in state.get("names", {}).items():
+        for entry in entries:
+            name_index.add(entry["name"], kind, target=entry["target"], **entry["info"])
+
+    log_event(logging.INFO, "warm_state_loaded", "♨️ Loaded warm state", path=path, age_s=round(time.time() - state.get("saved_at", 0)))
+    return True
+
+def start_warm_state_saver():
+    """Saves the warm state every WARM_STATE_SAVE_SECONDS and once more at exit."""
+    if not WARM_STATE_PATH:
+        return
+
+    def save_periodically():
+        while True:
+            time.sleep(WARM_STATE_SAVE_SECONDS)
+            save_warm_state()
+
+    threading.Thread(target=save_periodically, name="warm-state-saver", daemon=True).start()
+    atexit.register(save_warm_state)
+
+def enable_warm_state():
+    """Restores the warm state and keeps saving it. Only the server entry point opts in, so importing main writes nothing."""
+    load_warm_state()
+    start_warm_state_saver()
+
+def install_signal_handlers():
+    """Turns SIGTERM (what the host sends before sleeping us) into a normal exit so atexit saves the warm state."""
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+
+def snapshot_response(kind, key):
+    """Serves a stored snapshot with a strong ETag, If-None-Match -> 304, and gzip when accepted."""
+    with snapshots_lock:
+        snapshot = snapshots.get((kind, key))
+    if not snapshot:
+        return jsonify({"error": f"No {kind} snapshot for {key} yet"}), 404
+
+    use_gzip = request.accept_encodings["gzip"] > 0  # honours q=0
+    # Each encoding is its own representation, so it gets its own strong ETag
+    etag = snapshot["etag"] + ("-gz" if use_gzip else "")
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(snapshot["gzip_body"] if use_gzip else snapshot["body"], mimetype="application/json")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    response.last_modified = snapshot["updated_at"]
+    return response
+
+@app.route("/api/leagues", methods=["GET"])
+def api_leagues():
+    return jsonify([
+        {field: league[field] for field in ("key", "name", "title", "league_id", "lnr")}
+        for league in LEAGUES.values()
+    ])
+
+@app.route("/api/standings/<league>", methods=["GET"])
+def api_standings(league):
+    return snapshot_response("standings", league.lower())
+
+@app.route("/api/fixtures/<league>", methods=["GET"])
+def api_fixtures(league):
+    return snapshot_response("fixtures", league.lower())
+
+@app.route("/api/match/<game_id>", methods=["GET"])
+def api_match(game_id):
+    return snapshot_response("match", game_id)
+
+@app.route("/api/leaders/<league>/<category>", methods=["GET"])
+def api_leaders(league, category):
+    return snapshot_response("leaders", f"{league.lower()}/{category.lower()}")
+
 @app.route("/webhook", methods=["POST"])
 def groupme_webhook():
+    deadline = Deadline(WEBHOOK_DEADLINE_SECONDS)
     data = request.get_json()
-    sys.stderr.write(f"Webhook data received: {data}\n")
-
-    session = requests.Session()
+    log_event(
+        logging.INFO, "webhook_received", "Webhook received",
+        sender_type=(data or {}).get("sender_type"), sender_id=(data or {}).get("sender_id"), chars=len((data or {}).get("text") or ""),
+    )
+    log_event(logging.DEBUG, "webhook_payload", "Webhook payload", payload=data)
 
     if not data:
         return "No data received", 400
@@ -831,40 +2476,47 @@ def groupme_webhook():
     if sender_type == "bot":
         return "Ignoring bot message"
 
+    # 🔵 Full-round AI recap (checked before the plain league recap, which also matches "recap")
+    if any(bot_name in text_lower for bot_name in bot_aliases) and any(k in text_lower for k in ["full recap", "round recap", "full round"]):
+        if not begin_command("round_recap", deadline):
+            return "ok", 200
+        league = find_league(text_lower) or next(iter(LEAGUES.values()))
+        send_groupme_message(f"Oh we're doing the WHOLE round? Grab a seat, here's every game from the {league['name']}...", deadline)
+        posted = 0
+        for recap in generate_round_recaps(league, deadline):
+            send_groupme_message(recap, deadline)
+            posted += 1
+        if not posted:
+            send_groupme_message("Sorry, I couldn't find any recent matches in that league.", deadline)
+        return "ok", 200
+
     # 🟢 1. Handle League Recap Requests
-    if any(bot_name in text_lower for bot_name in bot_aliases) and any(k in text_lower for k in ["recap", "update"]) and ("goondesliga" in text_lower or "spoondesliga" in text_lower):
-        if "goondesliga" in text_lower:
-            league_url = GOONDESLIGA_URL
-            send_groupme_message("Alright y'all! Taycan A. giving you an update on the Goondesliga...")
-        elif "spoondesliga" in text_lower:
-            league_url = SPOONDESLIGA_URL
-            send_groupme_message("Alright y'all! Taycan A. giving you an update on the Spoondesliga...")
-        else:
-            send_groupme_message("Please specify which league you want a recap of (Goondesliga or Spoondesliga).")
+    recap_league = find_league(text_lower)
+    if any(bot_name in text_lower for bot_name in bot_aliases) and any(k in text_lower for k in ["recap", "update"]) and recap_league:
+        if not begin_command("league_recap", deadline):
             return "ok", 200
+        league_url = recap_league["url"]
+        send_groupme_message(f"Alright y'all! Taycan A. giving you an update on the {recap_league['name']}...", deadline)
 
-        matches = get_latest_game_ids_from_league(league_url)
+        matches = get_latest_game_ids_from_league(league_url, deadline)
         if not matches:
-            send_groupme_message("Sorry, I couldn't find any recent matches in that league.")
+            send_groupme_message("Sorry, I couldn't find any recent matches in that league.", deadline)
             return "ok", 200
 
-        session = get_logged_in_session()
+        session = get_logged_in_session(deadline)
         if not session:
-            send_groupme_message("⚠️ Failed to log in to Xpert Eleven to fetch match data.")
+            send_groupme_message("⚠️ Failed to log in to Xpert Eleven to fetch match data.", deadline)
             return "ok", 200
 
         match_scores = []
         top_players = []
 
         for match in matches:
-            match_html = scrape_match_html(session, f"https://www.xperteleven.com/gameDetails.aspx?GameID={match['game_id']}&dh=2")
-            if not match_html:
-                sys.stderr.write(f"⚠️ Failed to retrieve match page for game {match['game_id']}\n")
+            details = load_match_details(session, match["game_id"], deadline)
+            if not details:
+                log_event(logging.WARNING, "x11_fetch_failed", f"⚠️ Failed to retrieve match page for game {match['game_id']}")
                 continue
-
-            soup = BeautifulSoup(match_html, "html.parser")
-            match_data = parse_match_data(soup)
-            player_grades = parse_player_grades(soup, match_data["home_team"], match_data["away_team"])
+            match_data, player_grades, events = details
 
             score_line = f"{match_data['home_team']} {match_data['home_score']}-{match_data['away_score']} {match_data['away_team']}"
             match_scores.append(score_line)
@@ -875,14 +2527,14 @@ def groupme_webhook():
                 top_players.append(f"{top_player['name']} ({top_player['position']}, {top_player['grade']} 📊, {top_player['team']})")
 
         # Use the logged-in session to scrape standings
-        standings = scrape_league_standings_with_login(session, league_url)
+        standings = scrape_league_standings_with_login(session, league_url, deadline)
 
-        league_name = "The Goondesliga 🏆" if "goondesliga" in text_lower else "The Spoondesliga 🥄"
+        league_name = recap_league["title"]
 
         try:
-            standings_summary = generate_standings_summary(standings, league_name)
+            standings_summary = generate_standings_summary(standings, recap_league)
         except Exception as e:
-            sys.stderr.write(f"⚠️ Error parsing standings: {e}\n")
+            log_event(logging.WARNING, "standings_summary_failed", f"⚠️ Error parsing standings: {e}")
             standings_summary = "Standings data is missing."
 
         final_message = (
@@ -892,7 +2544,7 @@ def groupme_webhook():
             f"📈 Standings Update:\n{standings_summary}"
         )
 
-        send_groupme_message(final_message[:1500])
+        send_groupme_message(final_message[:1500], deadline)
         return "ok", 200
 
     # 🟠 2. Handle Specific Team Match Recap
@@ -900,15 +2552,15 @@ def groupme_webhook():
         resolved_team = resolve_team_name(text, team_mapping)
         if not resolved_team:
             return "ok", 200  # No team match, ignore
+        if not begin_command("recap", deadline):
+            return "ok", 200
 
-        league_urls = [GOONDESLIGA_URL, SPOONDESLIGA_URL]
-
-        for league_url in league_urls:
-            matches = get_latest_game_ids_from_league(league_url)
+        for league_url in league_urls():
+            matches = get_latest_game_ids_from_league(league_url, deadline)
             for match in matches:
-                if normalize(match["home_team"]) == normalize(resolved_team) or normalize(match["away_team"]) == normalize(resolved_team):
-                    summary = scrape_and_summarize_by_game_id(match["game_id"])
-                    send_groupme_message(summary)
+                if same_team(match["home_team"], resolved_team) or same_team(match["away_team"], resolved_team):
+                    summary = scrape_and_summarize_by_game_id(match["game_id"], deadline)
+                    send_groupme_message(summary, deadline)
                     return "ok", 200
 
     # 🟣 3. Handle TV Schedule Requests
@@ -916,87 +2568,76 @@ def groupme_webhook():
         if ("fsg" in text_lower or "tv" in text_lower) and any(
             kw in text_lower for kw in ["tv", "on", "kzhedule", "schedule", "guide", "games"]
         ):
-            sys.stderr.write("✅ Triggered TV schedule command.\n")
-            send_groupme_message("Ay y'all! Here's what's coming up on FoxSportsGoon...")
+            log_event(logging.INFO, "command", "✅ Triggered TV schedule command.", command="tv")
+            if not begin_command("tv", deadline):
+                return "ok", 200
+            send_groupme_message("Ay y'all! Here's what's coming up on FoxSportsGoon...", deadline)
             
-            session = get_logged_in_session()
+            session = get_logged_in_session(deadline)
             if not session:
-                send_groupme_message("⚠️ I couldn't log in to Xpert Eleven.")
+                send_groupme_message("⚠️ I couldn't log in to Xpert Eleven.", deadline)
                 return "ok", 200
 
-            goon_standings = scrape_league_standings_with_login(session, GOONDESLIGA_URL)
-            spoon_standings = scrape_league_standings_with_login(session, SPOONDESLIGA_URL)
-    
-            # FIXED: Scrape fixtures fully
-            goon_fixtures = scrape_upcoming_fixtures_from_standings_page(session, GOONDESLIGA_URL)
-            spoon_fixtures = scrape_upcoming_fixtures_from_standings_page(session, SPOONDESLIGA_URL)
+            # One shared crawl of every league's standings + fixtures page
+            crawl = crawl_leagues(session, deadline)
     
             # Generate and send TV schedule
-            tv_schedule = generate_tv_schedule_from_upcoming(
-                goon_fixtures, spoon_fixtures,
-                goon_standings, spoon_standings
-            )
-            send_groupme_message(tv_schedule)
+            tv_schedule = generate_tv_schedule_from_upcoming(crawl)
+            send_groupme_message(tv_schedule, deadline)
             return "ok", 200
 
     # 🟠 4. Handle Match Preview Requests
     if any(bot_name in text_lower for bot_name in bot_aliases) and "preview" in text_lower:
+        if not begin_command("preview", deadline):
+            return "ok", 200
         # Extract team name from message (attempt)
         resolved_team = resolve_team_name(text, team_mapping)
-        send_groupme_message("Preview? We talkin' 'bout previews? Jk y'all, let's get it...")
+        send_groupme_message("Preview? We talkin' 'bout previews? Jk y'all, let's get it...", deadline)
         if not resolved_team:
-            send_groupme_message("Ay yo, who?? I ain't never heard of that team.")
+            send_groupme_message("Ay yo, who?? I ain't never heard of that team.", deadline)
             return "ok", 200
     
-        session = get_logged_in_session()
+        session = get_logged_in_session(deadline)
         if not session:
-            send_groupme_message("⚠️ Failed to log in to Xpert Eleven to fetch match data.")
+            send_groupme_message("⚠️ Failed to log in to Xpert Eleven to fetch match data.", deadline)
             return "ok", 200
     
-        # Get standings for both leagues
-        goon_standings = scrape_league_standings_with_login(session, GOONDESLIGA_URL)
-        spoon_standings = scrape_league_standings_with_login(session, SPOONDESLIGA_URL)
-    
-        # Find upcoming fixtures
-        goon_fixtures = scrape_upcoming_fixtures_from_standings_page(session, GOONDESLIGA_URL)
-        spoon_fixtures = scrape_upcoming_fixtures_from_standings_page(session, SPOONDESLIGA_URL)
+        # Standings and upcoming fixtures for every league
+        crawl = crawl_leagues(session, deadline)
     
         # Look for upcoming match involving resolved_team
         upcoming_match = None
-        for match in goon_fixtures + spoon_fixtures:
-            if normalize(match["home_team"]) == normalize(resolved_team) or normalize(match["away_team"]) == normalize(resolved_team):
+        for match in (m for league in crawl.values() for m in league["fixtures"]):
+            if same_team(match["home_team"], resolved_team) or same_team(match["away_team"], resolved_team):
                 upcoming_match = match
                 break
     
         if not upcoming_match:
-            send_groupme_message(f"Hold on now...stay off the taaaaaar! {resolved_team} has a bye.")
+            send_groupme_message(f"Hold on now...stay off the taaaaaar! {resolved_team} has a bye.", deadline)
             return "ok", 200
     
         # Generate preview
-        preview_text = generate_match_preview(session, upcoming_match, goon_standings, spoon_standings)
-        send_groupme_message(preview_text[:1500])  # limit message size to 1500 chars
+        preview_text = generate_match_preview(session, upcoming_match, all_standings(crawl), deadline)
+        send_groupme_message(preview_text[:1500], deadline)  # limit message size to 1500 chars
         return "ok", 200
 
     # 🟢 5. Handle League Leaders
     if any(bot_name in text_lower for bot_name in bot_aliases):
         if any(kw in text_lower for kw in ["golden boot", "goals", "top scorers", "assists", "points", "x11", "mvp", "league leaders"]):
-            sys.stderr.write("✅ Triggered stat leaderboard command.\n")
-            send_groupme_message("Yo these dudes ain't my 🐐 Dougie Maradonut but...")
+            log_event(logging.INFO, "command", "✅ Triggered stat leaderboard command.", command="leaders")
+            if not begin_command("leaders", deadline):
+                return "ok", 200
+            send_groupme_message("Yo these dudes ain't my 🐐 Dougie Maradonut but...", deadline)
     
-            session = get_logged_in_session()
+            session = get_logged_in_session(deadline)
             if not session:
-                send_groupme_message("⚠️ I couldn't log in to Xpert Eleven.")
+                send_groupme_message("⚠️ I couldn't log in to Xpert Eleven.", deadline)
                 return "ok", 200
     
-            # Determine league and Lnr
-            if "spoon" in text_lower:
-                league_name = "Spoondesliga"
-                league_id = 460905
-                lnr = 2
-            else:
-                league_name = "Goondesliga"
-                league_id = 460905
-                lnr = 1
+            # Determine league and Lnr (the top flight unless another league is named)
+            league = find_league(text_lower) or next(iter(LEAGUES.values()))
+            league_name = league["name"]
+            league_id, lnr = league["league_id"], league["lnr"]
     
             # Determine which stat category
             if "golden boot" in text_lower or "goals" in text_lower or "top scorers" in text_lower:
@@ -1016,33 +2657,35 @@ def groupme_webhook():
     
             # If a specific stat category was requested
             if category:
-                top_players = scrape_league_stat_category(session, league_id, lnr, category, top_n=5)
+                top_players = scrape_league_stat_category(session, league_id, lnr, category, top_n=5, deadline=deadline)
                 if not top_players:
-                    send_groupme_message(f"Couldn't fetch {title} leaderboard right now yo")
+                    send_groupme_message(f"Couldn't fetch {title} leaderboard right now yo", deadline)
                     return "ok", 200
                 else:
                     message = f"{title} Leaders ({league_name}):\n\n"
                     for i, player in enumerate(top_players, 1):
                         message += f"{i}. {player}\n"
-                    send_groupme_message(message.strip())
+                    send_groupme_message(message.strip(), deadline)
                     return "ok", 200
     
             # General "league leaders" summary if no specific category
             leaderboard = {
-                "Golden Boot 👟": scrape_league_stat_category(session, league_id, lnr, "goals", top_n=1),
-                "Assists 🎩🪄": scrape_league_stat_category(session, league_id, lnr, "assists", top_n=1),
-                "Points 💎": scrape_league_stat_category(session, league_id, lnr, "points", top_n=1),
-                "MVP 🏅": scrape_league_stat_category(session, league_id, lnr, "x11", top_n=1)
+                "Golden Boot 👟": scrape_league_stat_category(session, league_id, lnr, "goals", top_n=1, deadline=deadline),
+                "Assists 🎩🪄": scrape_league_stat_category(session, league_id, lnr, "assists", top_n=1, deadline=deadline),
+                "Points 💎": scrape_league_stat_category(session, league_id, lnr, "points", top_n=1, deadline=deadline),
+                "MVP 🏅": scrape_league_stat_category(session, league_id, lnr, "x11", top_n=1, deadline=deadline)
             }
 
             message = f"{league_name} Leaders:\n\n"
             for label, players in leaderboard.items():
                 if players:
                     message += f"{label}\n{players[0]}\n\n"
-            send_groupme_message(message.strip())
+            send_groupme_message(message.strip(), deadline)
             return "ok", 200
     
     return "ok", 200
 
 if __name__ == "__main__":
+    enable_warm_state()
+    install_signal_handlers()
     app.run(host="0.0.0.0", port=10000)
@@ -0,0 +1,267 @@
+"""
+Local stand-ins for Xpert Eleven, Gemini and GroupMe so the bot can run offline.
+
+    python stub_server.py [port] [--x11-latency S] [--gemini-latency S] [--groupme-latency S] [--gemini-error-rate R]
+
+    X11_BASE_URL=http://localhost:8089 \
+    GOONDESLIGA_URL="http://localhost:8089/league.aspx?Lnr=1" \
+    SPOONDESLIGA_URL="http://localhost:8089/league.aspx?Lnr=2" \
+    GEMINI_API_BASE=http://localhost:8089/v1beta \
+    GROUPME_API_URL=http://localhost:8089/v3 \
+    python main.py
+
+X11 pages carry just the markup the scrapers look for, with deterministic
+teams from profiles.json; stats pages carry an ETag and answer If-None-Match
+with 304, league pages don't and re-render their __VIEWSTATE every time
+(like the real site). Gemini emulates generateContent with the real
+response shape and usageMetadata. Every upstream sleeps for its configured
+mean latency (+/- 50% jitter).
+"""
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, make_response, request
+
+app = Flask(__name__)
+
+# Mean seconds each upstream takes to answer; set from the CLI or configure()
+latency = {"x11": 0.0, "gemini": 0.0, "groupme": 0.0}
+gemini_error_rate = 0.0
+
+posted_messages = []  # GroupMe posts, newest last
+posted_lock = threading.Lock()
+
+with open("profiles.json", "r") as f:
+    TEAMS = sorted(p["team"] for p in json.load(f).values() if p.get("team"))
+# Two divisions: Lnr=1 gets the first half of the teams, Lnr=2 the rest
+LEAGUES = {1: TEAMS[: len(TEAMS) // 2], 2: TEAMS[len(TEAMS) // 2:]}
+POSITIONS = ["GK", "DL", "DC", "DC", "DR", "ML", "MC", "MC", "MR", "FC", "FC"]
+
+def configure(x11=None, gemini=None, groupme=None, error_rate=None):
+    global gemini_error_rate
+    for name, value in (("x11", x11), ("gemini", gemini), ("groupme", groupme)):
+        if value is not None:
+            latency[name] = value
+    if error_rate is not None:
+        gemini_error_rate = error_rate
+
+def inject_latency(upstream, scale=1.0):
+    mean = latency[upstream] * scale
+    if mean > 0:
+        time.sleep(mean * random.uniform(0.5, 1.5))
+
+# --- Xpert Eleven ---------------------------------------------------------
+
+def league_pairings(lnr):
+    teams = LEAGUES.get(lnr, [])
+    return [(teams[i], teams[i + 1]) for i in range(0, len(teams) - 1, 2)]
+
+def game_id_for(lnr, index, upcoming=False):
+    return 9_000_000 + lnr * 1000 + index * 10 + (1 if upcoming else 0)
+
+def player_name(team, i):
+    return f"{team.split()[0]} Player{i + 1}"
+
+@app.route("/front_new3.aspx", methods=["GET", "POST"])
+def x11_login():
+    inject_latency("x11")
+    if request.method == "POST":
+        response = make_response("<html><body><a href='logout.aspx'>Logout</a></body></html>")
+        response.set_cookie(".ASPXAUTH", uuid.uuid4().hex)
+        return response
+    return (
+        "<html><body><form>"
+        '<input id="__VIEWSTATE" value="vs"/>'
+        '<input id="__VIEWSTATEGENERATOR" value="vsg"/>'
+        '<input id="__EVENTVALIDATION" value="ev"/>'
+        "</form></body></html>"
+    )
+
+@app.after_request
+def compress_x11_pages(response):
+    """X11 serves its ASP.NET pages gzipped to clients that ask."""
+    if (
+        request.path.endswith(".aspx") and response.status_code == 200 and not response.direct_passthrough
+        and "gzip" in request.headers.get("Accept-Encoding", "")
+    ):
+        response.set_data(gzip.compress(response.get_data()))
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+@app.route("/league.aspx")
+def x11_league():
+    inject_latency("x11")
+    lnr = int(request.args.get("Lnr", 1))
+    teams = LEAGUES.get(lnr, [])
+
+    standings = ['<table id="ctl00_cphMain_dgStandings"><tr><td>#</td></tr>']
+    for place, team in enumerate(teams, 1):
+        wins, draws, losses = 10 - place, place % 3, place
+        gf, ga = 20 - place, 8 + place
+        standings.append(
+            f"<tr><td>{place}.</td><td></td><td><a>{team}</a></td><td></td><td></td><td></td>"
+            f"<td>{wins}</td><td>{draws}</td><td>{losses}</td><td>{gf} - {ga}</td>"
+            f"<td>{gf - ga:+d}</td><td>{wins * 3 + draws}</td></tr>"
+        )
+    standings.append("</table>")
+
+    played = ["<table>"]
+    upcoming = ['<table id="ctl00_cphMain_dgUpcoming">']
+    for i, (home, away) in enumerate(league_pairings(lnr)):
+        played.append(
+            f'<tr><td></td><td>{home}</td><td><a href="gameDetails.aspx?GameID={game_id_for(lnr, i)}">2-1</a></td>'
+            f"<td>{away}</td></tr>"
+        )
+        upcoming.append(
+            f"<tr onclick=\"location='gameDetails.aspx?GameID={game_id_for(lnr, i, upcoming=True)}'\">"
+            f"<td></td><td>{away}</td><td>-</td><td>{home}</td></tr>"
+        )
+    played.append("</table>")
+    upcoming.append("</table>")
+    # ASP.NET re-renders its hidden state on every request, like the real site
+    viewstate = f'<input type="hidden" name="__VIEWSTATE" value="{uuid.uuid4().hex}" />'
+    return "<html><body>" + viewstate + "".join(standings + played + upcoming) + "</body></html>"
+
+@app.route("/gameDetails.aspx")
+def x11_game():
+    inject_latency("x11")
+    game_id = int(request.args.get("GameID", 0))
+    lnr, index = (game_id - 9_000_000) // 1000, (game_id % 1000) // 10
+    pairings = league_pairings(lnr)
+    home, away = pairings[index] if index < len(pairings) else ("Home FC", "Away FC")
+    rng = random.Random(game_id)
+
+    events = []
+    score = [0, 0]
+    for minute in sorted(rng.sample(range(1, 91), 14)):
+        side = rng.randrange(2)
+        team = (home, away)[side]
+        who = player_name(team, rng.randrange(11))
+        roll = rng.random()
+        score_text = ""
+        if roll < 0.2:
+            score[side] += 1
+            desc = f"Goal by {who} (Grade: {rng.randint(6, 9)}), assist {player_name(team, rng.randrange(11))}"
+            score_text = f"{score[0]} - {score[1]}"
+        elif roll < 0.35:
+            desc = f"Yellow card for {who}"
+        elif roll < 0.4:
+            desc = f"Red card! {who} is sent off"
+        elif roll < 0.5:
+            desc = f"{player_name(team, 11)} subbed in for {who}"
+        else:
+            desc = f"Shot by {who} goes wide"
+        events.append(
+            f'<tr class="ItemStyle2"><td><span id="ctl00_cphMain_rptEvents_ctl{minute:02d}_lblEventTime">{minute}</span></td>'
+            f'<td><span id="ctl00_cphMain_rptEvents_ctl{minute:02d}_lblEventDesc">{desc}</span></td><td>{score_text}</td></tr>'
+        )
+
+    def lineup(team, side):
+        rows = []
+        for i, pos in enumerate(POSITIONS + ["SUB"]):
+            rows.append(
+                f'<tr class="ItemStyle"><td><span id="x_lbl{side}pos{i}">{pos}</span></td>'
+                f'<td><a id="x_hpl{side}PlayerName{i}" title="Grade: {rng.randint(3, 10)}">{player_name(team, i)}</a></td></tr>'
+            )
+        return f'<table id="ctl00_cphMain_dg{side}LineUp">' + "".join(rows) + "</table>"
+
+    return (
+        "<html><body>"
+        f'<a id="ctl00_cphMain_hplHomeTeam">{home}</a><a id="ctl00_cphMain_hplAwayTeam">{away}</a>'
+        f'<span id="ctl00_cphMain_lblHomeScore">{score[0]}</span><span id="ctl00_cphMain_lblAwayScore">{score[1]}</span>'
+        f'<span id="ctl00_cphMain_lblOmgang">Round 7</span><a id="ctl00_cphMain_hplDivision">Division {lnr}</a>'
+        f'<span id="ctl00_cphMain_lblArena">{home} Arena</span><span id="ctl00_cphMain_lblReferee">Pierluigi Bollocks</span>'
+        f'<a id="ctl00_cphMain_hplBestHome">{player_name(home, 9)}</a><a id="ctl00_cphMain_hplBestAway">{player_name(away, 9)}</a>'
+        f"<table>{''.join(events)}</table>{lineup(home, 'Home')}{lineup(away, 'Away')}"
+        "</body></html>"
+    )
+
+@app.route("/stats.aspx")
+def x11_stats():
+    inject_latency("x11")
+    lnr = int(request.args.get("Lnr", 1))
+    rng = random.Random(f"{lnr}{request.args.get('Sel')}")
+    rows = ["<tr><td>#</td><td>Name</td><td>Pos</td><td>Team</td><td>Value</td></tr>"]
+    for i, team in enumerate(LEAGUES.get(lnr, [])):
+        for j in range(3):
+            rows.append(
+                f"<tr><td>{i}</td><td>{player_name(team, 9 - j)}</td><td>FC</td><td>{team}</td>"
+                f"<td>{rng.randint(0, 15)}</td></tr>"
+            )
+    response = make_response(f'<html><body><table id="ctl00_cphMain_dgStats">{"".join(rows)}</table></body></html>')
+    response.add_etag()
+    return response.make_conditional(request)
+
+# --- GroupMe --------------------------------------------------------------
+
+@app.route("/v3/bots/post", methods=["POST"])
+def groupme_post():
+    inject_latency("groupme")
+    with posted_lock:
+        posted_messages.append(request.get_json() or {})
+        del posted_messages[:-500]
+    return "", 202
+
+# --- Gemini ---------------------------------------------------------------
+
+def gemini_error(code, message):
+    status = {400: "INVALID_ARGUMENT", 403: "PERMISSION_DENIED", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED"}.get(code, "UNKNOWN")
+    return jsonify({"error": {"code": code, "message": message, "status": status}}), code
+
+@app.route("/v1beta/models/<path:model_action>", methods=["POST"])
+def generate_content(model_action):
+    model, _, action = model_action.partition(":")
+    if action != "generateContent":
+        return gemini_error(404, f"Unknown action: {action}")
+
+    # "-lite" tiers answer in about half the time, like the real ones
+    inject_latency("gemini", 0.5 if "lite" in model else 1.0)
+    if gemini_error_rate and random.random() < gemini_error_rate:
+        return gemini_error(429, "Resource has been exhausted (stub).")
+
+    body = request.get_json() or {}
+    prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+    system_text = "".join(p.get("text", "") for p in body.get("systemInstruction", {}).get("parts", []))
+
+    text = f"[stub {model}] Taycan A. Schitt here with the highlights! ({len(prompt)} prompt chars)"
+    return jsonify({
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": (len(prompt) + len(system_text)) // 4,
+            "candidatesTokenCount": len(text) // 4,
+        },
+    })
+
+def stub_env(base_url):
+    """Environment that points main.py at a stub running on base_url."""
+    return {
+        "X11_BASE_URL": base_url,
+        "GOONDESLIGA_URL": f"{base_url}/league.aspx?Lnr=1",
+        "SPOONDESLIGA_URL": f"{base_url}/league.aspx?Lnr=2",
+        "GEMINI_API_BASE": f"{base_url}/v1beta",
+        "GEMINI_API_KEY": "stub",
+        "GROUPME_API_URL": f"{base_url}/v3",
+        "GROUPME_BOT_ID": "stub-bot",
+        "WARM_STATE_PATH": "",
+    }
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    def flag(name, default):
+        return float(args[args.index(name) + 1]) if name in args else default
+
+    configure(
+        x11=flag("--x11-latency", 0.0),
+        gemini=flag("--gemini-latency", 0.0),
+        groupme=flag("--groupme-latency", 0.0),
+        error_rate=flag("--gemini-error-rate", 0.0),
+    )
+    port = int(args[0]) if args and not args[0].startswith("--") else 8089
+    app.run(host="127.0.0.1", port=port, threaded=True)